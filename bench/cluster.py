@@ -0,0 +1,107 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from multiprocessing import Process
+
+from bench.stub_server import StubServer, SyntheticChain
+
+
+def _worker(worker_id: str, node_url: str, coordinator_db: str, directory: str, shard_size: int):
+    from etl.coordinator import run_worker
+
+    logging.disable(logging.INFO)
+    run_worker(worker_id, node_url, coordinator_db, directory, shard_size)
+
+
+def run_cluster(
+    workers: int,
+    blocks: int,
+    txs_per_block: int,
+    shard_size: int,
+    latency: float,
+    lease_size: int | None = None,
+) -> dict:
+    """
+    Backfills synthetic blocks with several worker processes, each pointed at its own stub node.
+
+    Parameters:
+        workers (int): The number of worker processes and stub servers.
+        blocks (int): The number of blocks to load.
+        txs_per_block (int): The number of transactions per block.
+        shard_size (int): The number of heights per shard.
+        latency (float): Seconds every stub response is delayed by.
+        lease_size (int | None): The number of heights per lease, defaults to the shard size.
+
+    Returns:
+        dict: The elapsed time, throughput and the final lease status.
+    """
+    from etl.coordinator import create_leases, lease_status
+
+    start_height = 800_000
+    chain = SyntheticChain(start_height, blocks, txs_per_block)
+    with tempfile.TemporaryDirectory() as directory, ExitStack() as stack:
+        servers = [stack.enter_context(StubServer(chain, latency)) for _ in range(workers)]
+        coordinator_db = os.path.join(directory, "coordinator.db")
+        create_leases(
+            start_height,
+            start_height + blocks - 1,
+            coordinator_db,
+            shard_size,
+            lease_size or shard_size,
+        )
+
+        started = time.perf_counter()
+        processes = [
+            Process(
+                target=_worker,
+                args=(f"worker-{index}", server.url, coordinator_db, directory, shard_size),
+            )
+            for index, server in enumerate(servers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "workers": workers,
+            "seconds": elapsed,
+            "blocks_per_second": blocks / elapsed,
+            "transactions_per_second": blocks * txs_per_block / elapsed,
+            "leases": lease_status(coordinator_db),
+        }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.cluster",
+        description="Run a local distributed backfill against stub esplora servers.",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument("--txs-per-block", type=int, default=100)
+    parser.add_argument("--shard-size", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--lease-size", type=int, help="defaults to the shard size")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    print(
+        run_cluster(
+            args.workers,
+            args.blocks,
+            args.txs_per_block,
+            args.shard_size,
+            args.latency_ms / 1000,
+            args.lease_size,
+        )
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
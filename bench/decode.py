@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+import time
+
+from bench.stub_server import TXS_PAGE_SIZE, SyntheticChain
+
+
+def _time_per_page(decode, pages: list[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for page in pages:
+            decode(page)
+        best = min(best, (time.perf_counter() - started) / len(pages))
+    return best
+
+
+def run_decode_benchmark(pages: int, inputs_per_tx: int, outputs_per_tx: int, repeat: int) -> dict:
+    """
+    Measures decode plus validate time of a /txs/ page for every available JSON path.
+
+    Parameters:
+        pages (int): The number of distinct synthetic pages to decode.
+        inputs_per_tx (int): The number of inputs per non-coinbase transaction.
+        outputs_per_tx (int): The number of outputs per transaction.
+        repeat (int): The number of runs, the fastest one is reported.
+
+    Returns:
+        dict: Seconds per page keyed by path name.
+    """
+    from common.config import ModelDecoding
+    from model.transaction import Transaction
+    from util.utils import decode_models, orjson
+
+    chain = SyntheticChain(1, pages + 1, TXS_PAGE_SIZE, inputs_per_tx, outputs_per_tx)
+    raw_pages = [
+        json.dumps(chain.transactions_page(height, 0)).encode() for height in chain.heights()
+    ][1:]
+
+    paths = {
+        "json.loads + model_validate": lambda raw: [
+            Transaction.model_validate(transaction) for transaction in json.loads(raw)
+        ],
+    }
+    # The strategies selectable with set_model_decoding, decode_then_validate decodes with
+    # orjson when it is installed.
+    for decoding in ModelDecoding:
+        paths[decoding.value] = lambda raw, decoding=decoding: decode_models(
+            list[Transaction], raw, decoding
+        )
+    if orjson is None:
+        paths["decode_then_validate"] = paths.pop(ModelDecoding.DECODE_THEN_VALIDATE.value)
+
+    return {name: _time_per_page(decode, raw_pages, repeat) for name, decode in paths.items()}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.decode",
+        description="Benchmark decoding and validating /txs/ pages with each JSON path.",
+    )
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--inputs-per-tx", type=int, default=2)
+    parser.add_argument("--outputs-per-tx", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run_decode_benchmark(args.pages, args.inputs_per_tx, args.outputs_per_tx, args.repeat)
+    baseline = results["json.loads + model_validate"]
+    for name, seconds in sorted(results.items(), key=lambda item: item[1]):
+        print(f"{name:<34}{seconds * 1e6:>10.1f} us/page{baseline / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
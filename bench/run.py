@@ -0,0 +1,237 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from bench.stub_server import StubServer, SyntheticChain
+from common.config import MODEL_DECODING, ModelDecoding
+
+COMPARED_METRICS = [
+    "blocks_per_second",
+    "transactions_per_second",
+    "peak_rss_bytes",
+    "peak_decode_worker_rss_bytes",
+    "db_bytes_per_transaction",
+]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_bytes(who: int) -> int:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(who).ru_maxrss * 1024
+
+
+def _load_and_measure(
+    url: str,
+    schema_name: str,
+    start_height: int,
+    end_height: int,
+    decode_workers: int,
+    model_decoding: ModelDecoding,
+    record_metrics: bool,
+    disabled_logging: int,
+) -> dict:
+    """Loads the blocks in a fresh process, so its peak RSS is the loader's alone."""
+    from common import metrics
+    from etl.pipeline import load_blocks, load_blocks_parallel
+    from util.utils import set_base_url, set_model_decoding
+
+    logging.disable(disabled_logging)
+    set_base_url(url)
+    set_model_decoding(model_decoding)
+    if record_metrics:
+        metrics.enable()
+        metrics.reset()
+
+    started = time.perf_counter()
+    if decode_workers:
+        transactions = load_blocks_parallel(start_height, end_height, schema_name, decode_workers)
+    else:
+        transactions = load_blocks(start_height, end_height, schema_name)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "seconds": elapsed,
+        "transactions": transactions,
+        "peak_rss_bytes": _peak_rss_bytes(resource.RUSAGE_SELF),
+        # The largest of the decode processes, all of them have exited with their pool.
+        "peak_decode_worker_rss_bytes": _peak_rss_bytes(resource.RUSAGE_CHILDREN),
+        "metrics": metrics.snapshot() if record_metrics else None,
+    }
+
+
+def run_benchmark(
+    blocks: int,
+    txs_per_block: int,
+    inputs_per_tx: int,
+    outputs_per_tx: int,
+    latency: float,
+    decode_workers: int = 0,
+    start_height: int = 800_000,
+    model_decoding: ModelDecoding = MODEL_DECODING,
+    record_metrics: bool = False,
+) -> dict:
+    """
+    Runs the extract and load path against a local stub server and measures it.
+
+    The load runs in a spawned process, so neither the stub server nor the synthetic chain
+    count towards the measured peak RSS.
+
+    Parameters:
+        blocks (int): The number of blocks to load.
+        txs_per_block (int): The number of transactions per block.
+        inputs_per_tx (int): The number of inputs per non-coinbase transaction.
+        outputs_per_tx (int): The number of outputs per transaction.
+        latency (float): Seconds every stub response is delayed by.
+        decode_workers (int): The number of processes decoding transactions, 0 to decode
+            in the loading process.
+        start_height (int): The height of the first synthetic block.
+        model_decoding (ModelDecoding): How transaction pages are decoded.
+        record_metrics (bool): Whether to add the common.metrics recorded during the load.
+
+    Returns:
+        dict: The benchmark parameters and results.
+    """
+    # Imported here so the stub server can be used without the pipeline dependencies.
+    from db.database import create_tables
+
+    chain = SyntheticChain(start_height, blocks, txs_per_block, inputs_per_tx, outputs_per_tx)
+    with (
+        tempfile.TemporaryDirectory() as directory,
+        StubServer(chain, latency) as server,
+        ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as loader,
+    ):
+        schema_name = os.path.join(directory, "bench.db")
+        create_tables(schema_name)
+        loaded = loader.submit(
+            _load_and_measure,
+            server.url,
+            schema_name,
+            start_height,
+            start_height + blocks - 1,
+            decode_workers,
+            model_decoding,
+            record_metrics,
+            logging.root.manager.disable,
+        ).result()
+        db_bytes = os.path.getsize(schema_name)
+
+    result = {
+        "revision": _git_revision(),
+        "parameters": {
+            "blocks": blocks,
+            "txs_per_block": txs_per_block,
+            "inputs_per_tx": inputs_per_tx,
+            "outputs_per_tx": outputs_per_tx,
+            "latency": latency,
+            "decode_workers": decode_workers,
+            "model_decoding": model_decoding.value,
+        },
+        "seconds": loaded["seconds"],
+        "transactions": loaded["transactions"],
+        "blocks_per_second": blocks / loaded["seconds"],
+        "transactions_per_second": loaded["transactions"] / loaded["seconds"],
+        "peak_rss_bytes": loaded["peak_rss_bytes"],
+        "peak_decode_worker_rss_bytes": loaded["peak_decode_worker_rss_bytes"],
+        "db_bytes": db_bytes,
+        "db_bytes_per_transaction": db_bytes / loaded["transactions"],
+    }
+    if record_metrics:
+        result["metrics"] = loaded["metrics"]
+    return result
+
+
+def compare(baseline: dict, result: dict) -> str:
+    """Returns a table of the compared metrics of two benchmark results."""
+    lines = [
+        f"{'metric':<32}{baseline.get('revision') or 'baseline':>16}"
+        f"{result.get('revision') or 'result':>16}{'change':>10}"
+    ]
+    for metric in COMPARED_METRICS:
+        if metric not in baseline or metric not in result:
+            # Measured by one revision only, e.g. an older result.
+            continue
+        old, new = baseline[metric], result[metric]
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        lines.append(f"{metric:<32}{old:>16.1f}{new:>16.1f}{change:>10}")
+    if baseline["parameters"] != result["parameters"]:
+        lines.append("warning: the results were measured with different parameters")
+    return "\n".join(lines)
+
+
+def _load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.run",
+        description="Benchmark the extract and load path against a local stub esplora server.",
+    )
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--txs-per-block", type=int, default=200)
+    parser.add_argument("--inputs-per-tx", type=int, default=2)
+    parser.add_argument("--outputs-per-tx", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay of every response")
+    parser.add_argument(
+        "--decode-workers", type=int, default=0, help="decode transactions in N processes"
+    )
+    parser.add_argument(
+        "--model-decoding",
+        choices=[decoding.value for decoding in ModelDecoding],
+        default=MODEL_DECODING.value,
+        help="how transaction pages are decoded",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="add the recorded latency histograms and counters"
+    )
+    parser.add_argument("--output", help="write the result as JSON to this file")
+    parser.add_argument("--baseline", help="compare the result with this earlier JSON result")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULT"), help="only compare")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's INFO logs")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare(_load(args.compare[0]), _load(args.compare[1])))
+        return
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    result = run_benchmark(
+        args.blocks,
+        args.txs_per_block,
+        args.inputs_per_tx,
+        args.outputs_per_tx,
+        args.latency_ms / 1000,
+        args.decode_workers,
+        model_decoding=ModelDecoding(args.model_decoding),
+        record_metrics=args.metrics,
+    )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    print(json.dumps(result, indent=2))
+    if args.baseline:
+        print(compare(_load(args.baseline), result))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
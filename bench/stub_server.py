@@ -0,0 +1,269 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENESIS_TIMESTAMP = 1_700_000_000
+BLOCK_INTERVAL = 600
+TXS_PAGE_SIZE = 10
+
+
+def _hash(*parts) -> str:
+    return hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class SyntheticChain:
+    """Deterministic esplora-style JSON documents for a range of synthetic blocks.
+
+    Every transaction spends outputs of transactions in the previous block, so inputs carry
+    realistic prevouts and witnesses.
+
+    Attributes:
+        start_height (int): The height of the first block.
+        block_count (int): The number of blocks.
+        txs_per_block (int): The number of transactions per block, including the coinbase.
+        inputs_per_tx (int): The number of inputs of every non-coinbase transaction.
+        outputs_per_tx (int): The number of outputs of every transaction.
+    """
+
+    def __init__(
+        self,
+        start_height: int,
+        block_count: int,
+        txs_per_block: int = 100,
+        inputs_per_tx: int = 2,
+        outputs_per_tx: int = 2,
+    ):
+        self.start_height = start_height
+        self.block_count = block_count
+        self.txs_per_block = txs_per_block
+        self.inputs_per_tx = inputs_per_tx
+        self.outputs_per_tx = outputs_per_tx
+        self.heights_by_hash = {self.block_hash(height): height for height in self.heights()}
+        self._tx_positions = None
+
+    def heights(self) -> range:
+        return range(self.start_height, self.start_height + self.block_count)
+
+    def block_hash(self, height: int) -> str:
+        return _hash("block", height)
+
+    def tx_id(self, height: int, index: int) -> str:
+        return _hash("tx", height, index)
+
+    def tx_position(self, tx_id: str) -> tuple[int, int] | None:
+        """Returns the (height, index) of a transaction ID, None if it is not in the chain."""
+        if self._tx_positions is None:
+            self._tx_positions = {
+                self.tx_id(height, index): (height, index)
+                for height in self.heights()
+                for index in range(self.txs_per_block)
+            }
+        return self._tx_positions.get(tx_id)
+
+    def address(self, height: int, tx_index: int, v_out: int) -> str:
+        return f"bc1q{_hash('address', height, tx_index, v_out)[:38]}"
+
+    def output(self, height: int, tx_index: int, v_out: int) -> dict:
+        return {
+            "scriptpubkey": f"0014{_hash('script', height, tx_index, v_out)[:40]}",
+            "scriptpubkey_asm": "OP_0 OP_PUSHBYTES_20",
+            "scriptpubkey_type": "v0_p2wpkh",
+            "scriptpubkey_address": self.address(height, tx_index, v_out),
+            "value": 10_000 + v_out,
+        }
+
+    def transaction(self, height: int, index: int) -> dict:
+        if index == 0:
+            inputs = [
+                {
+                    "txid": "0" * 64,
+                    "vout": 4294967295,
+                    "prevout": None,
+                    "scriptsig": f"03{height:06x}",
+                    "scriptsig_asm": f"OP_PUSHBYTES_3 {height:06x}",
+                    "witness": ["0" * 64],
+                    "is_coinbase": True,
+                    "sequence": 4294967295,
+                    "inner_redeemscript_asm": "",
+                    "inner_witnessscript_asm": "",
+                }
+            ]
+        else:
+            inputs = []
+            for n in range(self.inputs_per_tx):
+                prev_index = (index * self.inputs_per_tx + n) % self.txs_per_block
+                prev_v_out = n % self.outputs_per_tx
+                inputs.append(
+                    {
+                        "txid": self.tx_id(height - 1, prev_index),
+                        "vout": prev_v_out,
+                        "prevout": self.output(height - 1, prev_index, prev_v_out),
+                        "scriptsig": "",
+                        "scriptsig_asm": "",
+                        "witness": [
+                            _hash("sig", height, index, n) + _hash("sig2", height, index, n),
+                            f"02{_hash('pubkey', height, index, n)}",
+                        ],
+                        "is_coinbase": False,
+                        "sequence": 4294967293,
+                        "inner_redeemscript_asm": "",
+                        "inner_witnessscript_asm": "",
+                    }
+                )
+
+        return {
+            "txid": self.tx_id(height, index),
+            "version": 2,
+            "locktime": 0,
+            "vin": inputs,
+            "vout": [self.output(height, index, v_out) for v_out in range(self.outputs_per_tx)],
+            "size": 222,
+            "weight": 561,
+            "vsize": 141,
+            "feePerVsize": 3.5,
+            "effectiveFeePerVsize": 3.5,
+            "fee": 0 if index == 0 else 500,
+            "status": {
+                "confirmed": True,
+                "block_height": height,
+                "block_hash": self.block_hash(height),
+                "block_time": self.timestamp(height),
+            },
+        }
+
+    def timestamp(self, height: int) -> int:
+        return GENESIS_TIMESTAMP + (height - self.start_height) * BLOCK_INTERVAL
+
+    def block(self, height: int) -> dict:
+        pool_id = height % 5
+        return {
+            "id": self.block_hash(height),
+            "height": height,
+            "version": 536870912,
+            "timestamp": self.timestamp(height),
+            "bits": 386089497,
+            "nonce": height,
+            "difficulty": 83148355189239.77,
+            "merkle_root": _hash("merkle", height),
+            "tx_count": self.txs_per_block,
+            "size": 222 * self.txs_per_block,
+            "weight": 561 * self.txs_per_block,
+            "previousblockhash": self.block_hash(height - 1),
+            "mediantime": self.timestamp(height) - 3000,
+            "extras": {
+                "header": _hash("header", height) * 2 + _hash("header2", height)[:32],
+                "reward": 312_500_000 + 500 * (self.txs_per_block - 1),
+                "medianFee": 3.5,
+                "feeRange": [1.0, 2.0, 3.5, 5.0, 10.0, 20.0, 50.0],
+                "totalFees": 500 * (self.txs_per_block - 1),
+                "avgFee": 500,
+                "avgFeeRate": 3,
+                "coinbaseRaw": f"03{height:06x}",
+                "coinbaseAddress": self.address(height, 0, 0),
+                "coinbaseAddresses": [self.address(height, 0, 0)],
+                "coinbaseSignature": "OP_0 OP_PUSHBYTES_20",
+                "utxoSetChange": self.txs_per_block,
+                "avgTxSize": 222.0,
+                "totalInputs": self.inputs_per_tx * (self.txs_per_block - 1) + 1,
+                "totalOutputs": self.outputs_per_tx * self.txs_per_block,
+                "totalOutputAmt": 20_001 * self.txs_per_block,
+                "segwitTotalTxs": self.txs_per_block,
+                "segwitTotalSize": 222 * self.txs_per_block,
+                "segwitTotalWeight": 561 * self.txs_per_block,
+                "virtualSize": 141.0 * self.txs_per_block,
+                "pool": {
+                    "id": pool_id,
+                    "name": f"Pool {pool_id}",
+                    "slug": f"pool-{pool_id}",
+                    "minerNames": None,
+                },
+                "similarity": 0.99,
+            },
+        }
+
+    def transactions_page(self, height: int, start_index: int) -> list[dict]:
+        end_index = min(start_index + TXS_PAGE_SIZE, self.txs_per_block)
+        return [self.transaction(height, index) for index in range(start_index, end_index)]
+
+    def resolve(self, path: str):
+        """Returns the response body for an API path, None if the path is unknown."""
+        parts = path.strip("/").split("/")
+        if parts[0] == "block-height" and len(parts) == 2:
+            height = int(parts[1])
+            return self.block_hash(height) if height in self.heights() else None
+        if parts[0] == "block" and len(parts) >= 2 and parts[1] in self.heights_by_hash:
+            height = self.heights_by_hash[parts[1]]
+            if len(parts) == 2:
+                return self.block(height)
+            if parts[2] == "txids":
+                return [self.tx_id(height, index) for index in range(self.txs_per_block)]
+            if parts[2] == "txs":
+                return self.transactions_page(height, int(parts[3]) if len(parts) > 3 else 0)
+        if parts[0] == "tx" and len(parts) == 2:
+            position = self.tx_position(parts[1])
+            return self.transaction(*position) if position is not None else None
+        if parts[0] == "blocks":
+            top = int(parts[1]) if len(parts) > 1 else self.heights()[-1]
+            return [self.block(h) for h in range(top, max(top - 10, self.start_height - 1), -1)]
+        return None
+
+
+class StubServer:
+    """Local HTTP server answering esplora API paths from a SyntheticChain.
+
+    Use as a context manager; the base URL to point the extractor at is in `url`.
+
+    Attributes:
+        chain (SyntheticChain): The chain to serve.
+        latency (float): Seconds every response is delayed by, to mimic a remote node.
+        url (str): The base URL of the API, available once started.
+    """
+
+    def __init__(self, chain: SyntheticChain, latency: float = 0.0, port: int = 0):
+        self.chain = chain
+        self.latency = latency
+        self.port = port
+        self.url = None
+        self._server = None
+        self._thread = None
+
+    def _handler(self):
+        chain, latency = self.chain, self.latency
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if latency:
+                    time.sleep(latency)
+                body = chain.resolve(self.path.removeprefix("/api"))
+                if body is None:
+                    self.send_error(404)
+                    return
+                if isinstance(body, str):
+                    payload, content_type = body.encode(), "text/plain"
+                else:
+                    payload, content_type = json.dumps(body).encode(), "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/api/"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
@@ -9,15 +9,52 @@ class Api(Enum):
     BLOCKS = "blocks/"
     TXS_SEGMENTS = "/txs/"
     TX_IDS_SEGMENT = "/txids/"
+    MEMPOOL = "mempool"
+    MEMPOOL_TX_IDS = "mempool/txids"
+    TX = "tx/"
 
 
 BASE_URL = "http://umbrel.local:3006/api/"
 
 # HTTP
 DEFAULT_TIMEOUT = 10
+TXS_PAGE_SIZE = 10
+PAGE_FETCH_THREADS = 8
+
+
+# JSON decoding
+class ModelDecoding(Enum):
+    # pydantic parses the raw JSON itself, without building intermediate dicts.
+    VALIDATE_JSON = "validate_json"
+    # util.utils.json_decoder (orjson when installed) builds dicts that pydantic then validates.
+    DECODE_THEN_VALIDATE = "decode_then_validate"
+
+
+MODEL_DECODING = ModelDecoding.VALIDATE_JSON
 
 # Logging
 LOGGER_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+PROGRESS_LOG_INTERVAL = 10
+
+# Metrics
+METRICS_ENV_VAR = "BITCOIN_ETL_METRICS"
+METRICS_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+METRICS_PORT = 9464
 
 # Time
 DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
@@ -34,3 +71,68 @@ TABLE_TRANSACTIONS = "transactions"
 TABLE_TX_INPUTS = "tx_inputs"
 TABLE_TX_OUTPUTS = "tx_outputs"
 TABLE_WITNESSES = "witnesses"
+TABLE_WITNESS_ARCHIVE = "witness_archive"
+TABLE_ADDRESS_POSTINGS = "address_postings"
+TABLE_BLOCK_ROLLUPS = "block_rollups"
+TABLE_POOL_ROLLUPS = "pool_rollups"
+TABLE_MEMPOOL_SNAPSHOTS = "mempool_snapshots"
+TABLE_MEMPOOL_TX_DELTAS = "mempool_tx_deltas"
+TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS = "mempool_fee_histogram_deltas"
+
+
+# Witnesses
+class WitnessStorage(Enum):
+    ROWS = "rows"
+    ARCHIVE = "archive"
+
+
+WITNESS_STORAGE = WitnessStorage.ROWS
+WITNESS_COMPRESSION_LEVEL = 6
+
+# Sharding
+SHARD_SIZE = 100_000
+SHARD_NAME_FORMAT = "bitcoin_etl_{start_height:07d}.db"
+# SQLite attaches at most 10 databases to one connection by default.
+MAX_ATTACHED_SHARDS = 10
+
+# Distributed backfill
+COORDINATOR_DB_NAME = "bitcoin_etl_coordinator.db"
+TABLE_LEASES = "leases"
+LEASE_TIMEOUT = 120
+HEARTBEAT_INTERVAL = 30
+# Heights per lease, a divisor of SHARD_SIZE. Several workers can fill one shard, and a failed
+# lease only restarts its own heights.
+LEASE_SIZE = 1_000
+# Claims after which a lease that keeps failing or expiring is marked failed and skipped.
+MAX_LEASE_ATTEMPTS = 5
+
+
+class LeaseStatus(Enum):
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+# Graph export
+GRAPH_DIRECTORY = "graph"
+
+# Mempool
+MEMPOOL_SNAPSHOT_INTERVAL = 60
+
+
+# Rollups
+class RollupBucket(Enum):
+    HOURLY = "hourly"
+    DAILY = "daily"
+    WEEKLY = "weekly"
+
+
+# Bulk load
+STAGING_SUFFIX = "_staging"
+
+# Queries
+ADDRESS_HISTORY_PAGE_SIZE = 100
+READ_CACHE_SIZE = 1024
+# Blocks this far below the local tip are treated as immutable and may be cached.
+READ_CACHE_CONFIRMATIONS = 100
@@ -1,20 +1,115 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
 
-from common.config import LOGGER_FORMAT
+from common.config import LOGGER_FORMAT, PROGRESS_LOG_INTERVAL
+
+_log_queue = queue.SimpleQueue()
+_listener = None
+# Set in forked children, which do not inherit the listener thread and write directly.
+_direct_handler = None
+
+
+def _console_handler() -> logging.Handler:
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(LOGGER_FORMAT))
+    return console_handler
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records as they are, leaving message formatting to the listener thread.
+
+    The record's args are formatted later on another thread, so they must not be mutated
+    after the logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if _direct_handler is not None:
+            _direct_handler.handle(record)
+        else:
+            super().emit(record)
+
+
+def _start_listener() -> None:
+    global _listener
+    if _listener is not None or _direct_handler is not None:
+        return
+
+    _listener = QueueListener(_log_queue, _console_handler())
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread only runs in the process that started it. A forked child, e.g. a
+    # ProcessPoolExecutor worker, would queue records nobody drains, so it writes directly;
+    # worker processes also exit without running atexit, which would lose queued records.
+    global _direct_handler
+    _direct_handler = _console_handler()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def setup_logger(name: str, level=logging.INFO) -> logging.Logger:
+    """
+    Returns a logger writing to stdout through a background thread.
+
+    Records are queued without being formatted, so use lazy %-style arguments
+    (logger.debug("Got %s", value)) and the message is only built if it is emitted,
+    off the calling thread. Arguments are not copied: do not mutate an object after passing
+    it as a logging argument. Forked child processes write directly instead.
+    """
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
     if logger.handlers:
         return logger
 
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    formatter = logging.Formatter(LOGGER_FORMAT)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    _start_listener()
+    queue_handler = _DeferredQueueHandler(_log_queue)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
 
     return logger
+
+
+class ProgressLogger:
+    """Aggregates progress counts and logs them as one line at most every interval seconds.
+
+    Attributes:
+        logger (logging.Logger): The logger to write the progress lines to.
+        interval (float): Minimum seconds between two progress lines.
+        counts (dict[str, int]): Totals per counted unit, e.g. {"blocks": 3, "transactions": 9}.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = PROGRESS_LOG_INTERVAL):
+        self.logger = logger
+        self.interval = interval
+        self.counts = {}
+        self._started = self._last_logged = time.monotonic()
+
+    def add(self, **counts: int) -> None:
+        for unit, count in counts.items():
+            self.counts[unit] = self.counts.get(unit, 0) + count
+
+        now = time.monotonic()
+        if now - self._last_logged >= self.interval:
+            self._last_logged = now
+            self.log()
+
+    def log(self) -> None:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        self.logger.info(
+            "Progress: %s.",
+            ", ".join(
+                f"{count} {unit} ({count / elapsed:.1f}/s)" for unit, count in self.counts.items()
+            ),
+        )
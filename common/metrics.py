@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from common.config import METRICS_ENV_VAR, METRICS_LATENCY_BUCKETS, METRICS_PORT
+
+# Checked by every instrumented call site; while False the instrumentation is a no-op.
+enabled = os.environ.get(METRICS_ENV_VAR, "") not in ("", "0")
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_started = time.monotonic()
+_null_timer = nullcontext()
+
+
+class Histogram:
+    """Fixed bucket histogram of observed values.
+
+    Attributes:
+        buckets (tuple[float, ...]): Upper bounds of the buckets, ascending.
+        counts (list[int]): Observations per bucket, the last one counting values above all bounds.
+        sum (float): Sum of all observed values.
+        count (int): Number of observed values.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: dict[str, str]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def _key(name: str, labels: dict[str, str]) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    """Drops every recorded metric and restarts the rate clock."""
+    global _started
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _started = time.monotonic()
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    """Records a value (usually seconds) in the histogram identified by name and labels."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Adds to the counter identified by name and labels."""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def timer(name: str, **labels: str):
+    """
+    Returns a context manager recording the duration of its block in the named histogram.
+
+    Parameters:
+        name (str): The name of the histogram.
+        labels (str): The labels of the histogram, e.g. table="blocks".
+
+    Returns:
+        A context manager, a shared no-op one while metrics are disabled.
+    """
+    if not enabled:
+        return _null_timer
+    return _Timer(name, labels)
+
+
+def snapshot() -> dict:
+    """
+    Returns all recorded metrics as plain data.
+
+    Counters carry their average rate per second since start (or the last reset),
+    e.g. rows/s for rows_inserted_total.
+    """
+    with _lock:
+        uptime = time.monotonic() - _started
+        return {
+            "uptime_seconds": uptime,
+            "counters": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "value": value,
+                    "rate_per_second": value / uptime if uptime > 0 else 0.0,
+                }
+                for (name, labels), value in sorted(_counters.items())
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(
+                        zip(
+                            [str(bound) for bound in histogram.buckets] + ["+Inf"],
+                            _cumulative(histogram.counts),
+                        )
+                    ),
+                }
+                for (name, labels), histogram in sorted(_histograms.items())
+            ],
+        }
+
+
+def _cumulative(counts: list[int]) -> list[int]:
+    total = 0
+    cumulative = []
+    for count in counts:
+        total += count
+        cumulative.append(total)
+    return cumulative
+
+
+def _escape_label_value(value) -> str:
+    # Backslash first, so the escapes added for quotes and newlines are kept as they are.
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str], **extra: str) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items())
+        + "}"
+    )
+
+
+def to_json() -> str:
+    """Returns all recorded metrics as a JSON document."""
+    return json.dumps(snapshot(), indent=2)
+
+
+def to_prometheus() -> str:
+    """Returns all recorded metrics in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+    typed = set()
+    for counter in data["counters"]:
+        if counter["name"] not in typed:
+            typed.add(counter["name"])
+            lines.append(f"# TYPE {counter['name']} counter")
+        lines.append(f"{counter['name']}{_format_labels(counter['labels'])} {counter['value']}")
+    for histogram in data["histograms"]:
+        name, labels = histogram["name"], histogram["labels"]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        for bound, count in histogram["buckets"].items():
+            lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int = METRICS_PORT, host: str = ""):
+    """
+    Exposes the metrics over HTTP from a daemon thread, for Prometheus to scrape.
+
+    /metrics answers in the Prometheus text format, /metrics.json with to_json.
+
+    Parameters:
+        port (int): The port to listen on, 0 for any free one.
+        host (str): The interface to listen on, all of them by default.
+
+    Returns:
+        ThreadingHTTPServer: The running server, stop it with shutdown().
+    """
+    # Imported here so that importing the metrics stays cheap for every instrumented module.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
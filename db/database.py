@@ -2,21 +2,49 @@ import sqlite3
 
 from common.config import (
     DB_NAME,
+    STAGING_SUFFIX,
+    TABLE_ADDRESS_POSTINGS,
+    TABLE_BLOCK_ROLLUPS,
     TABLE_BLOCKS,
     TABLE_COINBASE_ADDRESSES,
     TABLE_EXTRAS,
     TABLE_FEE_RANGE,
+    TABLE_LEASES,
+    TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS,
+    TABLE_MEMPOOL_SNAPSHOTS,
+    TABLE_MEMPOOL_TX_DELTAS,
     TABLE_MINERS,
+    TABLE_POOL_ROLLUPS,
     TABLE_POOLS,
     TABLE_TRANSACTIONS,
     TABLE_TX_INPUTS,
     TABLE_TX_OUTPUTS,
+    TABLE_WITNESS_ARCHIVE,
     TABLE_WITNESSES,
 )
 from common.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Tables whose rows are not partitioned by height, so a shard does not hold a disjoint part of
+# them: rollup buckets cross shard boundaries and mempool snapshots are not tied to a height.
+UNSHARDED_TABLES = {
+    TABLE_BLOCK_ROLLUPS,
+    TABLE_POOL_ROLLUPS,
+    TABLE_MEMPOOL_SNAPSHOTS,
+    TABLE_MEMPOOL_TX_DELTAS,
+    TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS,
+}
+
+# Tables loaded through staging tables in bulk mode, with the key they are merged in order of.
+STAGED_TABLES = {
+    TABLE_TRANSACTIONS: "tx_id",
+    TABLE_TX_OUTPUTS: "tx_id, v_out_index",
+    TABLE_TX_INPUTS: "tx_id, v_in_index",
+    TABLE_WITNESSES: "tx_id, v_in_index, item_index",
+    TABLE_ADDRESS_POSTINGS: "address, height, tx_index",
+}
+
 
 def create_block_tables(cursor: sqlite3.Cursor):
     """Creating all tables necessary for blocks."""
@@ -82,7 +110,8 @@ def create_block_tables(cursor: sqlite3.Cursor):
     cursor.execute(
         f"""
         CREATE TABLE IF NOT EXISTS {TABLE_COINBASE_ADDRESSES} (
-            height INTEGER PRIMARY KEY,
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            height INTEGER NOT NULL,
             address TEXT NOT NULL,
             FOREIGN KEY (height) REFERENCES blocks(height) ON DELETE CASCADE
         )
@@ -112,6 +141,14 @@ def create_block_tables(cursor: sqlite3.Cursor):
     """
     )
 
+    # Rollups select the blocks of a time bucket.
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_blocks_timestamp ON {TABLE_BLOCKS} (timestamp)")
+    # The read API collects the rows of a block in insertion order.
+    for table_name in (TABLE_FEE_RANGE, TABLE_COINBASE_ADDRESSES, TABLE_MINERS):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table_name}_height ON {table_name} (height, id)"
+        )
+
     logger.info("Block related tables created.")
 
 
@@ -122,6 +159,7 @@ def create_transaction_tables(cursor: sqlite3.Cursor):
         CREATE TABLE IF NOT EXISTS {TABLE_TRANSACTIONS} (
             tx_id TEXT PRIMARY KEY,
             block_height INTEGER NOT NULL,
+            tx_index INTEGER NOT NULL,
             v_size INTEGER NOT NULL,
             fee_per_vsize INTEGER NOT NULL,
             effective_fee_per_vsize INTEGER NOT NULL,
@@ -173,28 +211,395 @@ def create_transaction_tables(cursor: sqlite3.Cursor):
     cursor.execute(
         f"""
         CREATE TABLE IF NOT EXISTS {TABLE_WITNESSES} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
             tx_id TEXT NOT NULL,
+            v_in_index INTEGER NOT NULL,
+            item_index INTEGER NOT NULL,
             witness TEXT NOT NULL,
+            PRIMARY KEY (tx_id, v_in_index, item_index),
             FOREIGN KEY (tx_id) REFERENCES transactions(tx_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_WITNESS_ARCHIVE} (
+            height INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            FOREIGN KEY (height) REFERENCES blocks(height) ON DELETE CASCADE
         )
     """
     )
 
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_ADDRESS_POSTINGS} (
+            address TEXT NOT NULL,
+            height INTEGER NOT NULL,
+            tx_index INTEGER NOT NULL,
+            tx_id TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            PRIMARY KEY (address, height, tx_index),
+            FOREIGN KEY (tx_id) REFERENCES transactions(tx_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """
+    )
+    # Per block lookups (graph export, read API) start from a block's transactions.
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_transactions_block_height "
+        f"ON {TABLE_TRANSACTIONS} (block_height, tx_id)"
+    )
+
     logger.info("Transaction related tables created.")
 
 
-def create_tables():
-    conn = sqlite3.connect(DB_NAME)
+def create_mempool_tables(cursor: sqlite3.Cursor):
+    """Creating all tables necessary for mempool snapshots."""
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_MEMPOOL_SNAPSHOTS} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            v_size INTEGER NOT NULL,
+            total_fee INTEGER NOT NULL,
+            is_full BOOLEAN NOT NULL
+        )
+    """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_MEMPOOL_TX_DELTAS} (
+            snapshot_id INTEGER NOT NULL,
+            tx_id TEXT NOT NULL,
+            added BOOLEAN NOT NULL,
+            PRIMARY KEY (snapshot_id, tx_id),
+            FOREIGN KEY (snapshot_id) REFERENCES mempool_snapshots(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """
+    )
+
+    # v_size is NULL for a bucket removed since the previous snapshot.
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS} (
+            snapshot_id INTEGER NOT NULL,
+            fee_rate REAL NOT NULL,
+            v_size INTEGER,
+            PRIMARY KEY (snapshot_id, fee_rate),
+            FOREIGN KEY (snapshot_id) REFERENCES mempool_snapshots(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """
+    )
+
+    logger.info("Mempool related tables created.")
+
+
+def create_rollup_tables(cursor: sqlite3.Cursor):
+    """Creating all tables necessary for time bucket rollups of block metrics."""
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_BLOCK_ROLLUPS} (
+            bucket TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            min_height INTEGER NOT NULL,
+            max_height INTEGER NOT NULL,
+            block_count INTEGER NOT NULL,
+            tx_count INTEGER NOT NULL,
+            total_fees INTEGER NOT NULL,
+            total_weight INTEGER NOT NULL,
+            avg_difficulty REAL NOT NULL,
+            median_fee REAL NOT NULL,
+            PRIMARY KEY (bucket, bucket_start)
+        ) WITHOUT ROWID
+    """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_POOL_ROLLUPS} (
+            bucket TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            pool_id INTEGER NOT NULL,
+            pool_name TEXT,
+            block_count INTEGER NOT NULL,
+            share REAL NOT NULL,
+            PRIMARY KEY (bucket, bucket_start, pool_id)
+        ) WITHOUT ROWID
+    """
+    )
+
+    logger.info("Rollup related tables created.")
+
+
+def create_coordination_tables(cursor: sqlite3.Cursor):
+    """Creating all tables necessary for coordinating distributed backfill workers."""
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_LEASES} (
+            start_height INTEGER PRIMARY KEY,
+            end_height INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            worker_id TEXT,
+            heartbeat_at REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            completed_at REAL,
+            last_error TEXT
+        )
+    """
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_leases_status ON {TABLE_LEASES} (status, start_height)"
+    )
+
+    logger.info("Coordination related tables created.")
+
+
+def _columns(cursor: sqlite3.Cursor, table_name: str) -> list[str]:
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})")]
+
+
+def _add_transaction_index(cursor: sqlite3.Cursor):
+    """Adds transactions.tx_index, numbering the transactions of a block in insertion order."""
+    if "tx_index" in _columns(cursor, TABLE_TRANSACTIONS):
+        return
+
+    cursor.execute(
+        f"ALTER TABLE {TABLE_TRANSACTIONS} ADD COLUMN tx_index INTEGER NOT NULL DEFAULT 0"
+    )
+    # Transactions used to be inserted page by page in block order, so rowid order is block order.
+    cursor.execute(
+        f"""
+        UPDATE {TABLE_TRANSACTIONS} SET tx_index = ranked.tx_index
+        FROM (
+            SELECT rowid AS id,
+                ROW_NUMBER() OVER (PARTITION BY block_height ORDER BY rowid) - 1 AS tx_index
+            FROM {TABLE_TRANSACTIONS}
+        ) AS ranked
+        WHERE {TABLE_TRANSACTIONS}.rowid = ranked.id
+    """
+    )
+    logger.info("Added tx_index to %s transactions.", cursor.rowcount)
+
+
+def _rekey_coinbase_addresses(cursor: sqlite3.Cursor):
+    """Rebuilds coinbase_addresses, keyed by height before, so a block can have several."""
+    if "id" in _columns(cursor, TABLE_COINBASE_ADDRESSES):
+        return
+
+    cursor.execute(
+        f"ALTER TABLE {TABLE_COINBASE_ADDRESSES} RENAME TO {TABLE_COINBASE_ADDRESSES}_old"
+    )
+    create_block_tables(cursor)
+    cursor.execute(
+        f"""
+        INSERT INTO {TABLE_COINBASE_ADDRESSES} (height, address)
+        SELECT height, address FROM {TABLE_COINBASE_ADDRESSES}_old ORDER BY height
+    """
+    )
+    logger.info("Rebuilt %s with %s rows.", TABLE_COINBASE_ADDRESSES, cursor.rowcount)
+    cursor.execute(f"DROP TABLE {TABLE_COINBASE_ADDRESSES}_old")
+
+
+def _rekey_witnesses(cursor: sqlite3.Cursor):
+    """
+    Rebuilds witnesses keyed by transaction, input and item index.
+
+    Witness items used to be stored without the input they belong to, which cannot be recovered,
+    so only an empty table is migrated.
+
+    Raises:
+        RuntimeError: If the table holds witness items, naming the heights to load again.
+    """
+    columns = _columns(cursor, TABLE_WITNESSES)
+    if not columns or "v_in_index" in columns:
+        return
+
+    first_height, last_height = cursor.execute(
+        f"""
+        SELECT MIN(block_height), MAX(block_height) FROM {TABLE_TRANSACTIONS}
+        WHERE tx_id IN (SELECT tx_id FROM {TABLE_WITNESSES})
+    """
+    ).fetchone()
+    if first_height is not None:
+        raise RuntimeError(
+            f"The {TABLE_WITNESSES} table holds witness items of heights {first_height} to "
+            f"{last_height} without the input they belong to. Delete these blocks and load "
+            f"them again to migrate the database."
+        )
+
+    cursor.execute(f"DROP TABLE {TABLE_WITNESSES}")
+    create_transaction_tables(cursor)
+    logger.info("Rebuilt %s keyed by input and item index.", TABLE_WITNESSES)
+
+
+# Upgrades of the tables of an existing database, MIGRATIONS[n] bringing it from version n to
+# n + 1. The version is kept in PRAGMA user_version. Databases written before versioning are at
+# version 0 whatever their layout, so every migration first checks whether it is still needed.
+MIGRATIONS = [
+    [_add_transaction_index, _rekey_coinbase_addresses],
+    [_rekey_witnesses],
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate_tables(cursor: sqlite3.Cursor):
+    """
+    Brings the tables of an existing database up to SCHEMA_VERSION.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use, inside the transaction creating the tables.
+
+    Raises:
+        RuntimeError: If the database was written by a newer version of the schema.
+    """
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"The database has schema version {version}, this version of the ETL only knows "
+            f"schema versions up to {SCHEMA_VERSION}."
+        )
+
+    has_tables = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE_BLOCKS,)
+    ).fetchone()
+    if has_tables:
+        for target_version in range(version + 1, SCHEMA_VERSION + 1):
+            logger.info("Migrating the database to schema version %s.", target_version)
+            for migration in MIGRATIONS[target_version - 1]:
+                migration(cursor)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def create_tables(schema_name: str = DB_NAME):
+    conn = sqlite3.connect(schema_name)
     conn.execute("PRAGMA foreign_keys = ON")
     cursor = conn.cursor()
 
     try:
+        # Schema changes and migrations are applied all or nothing. IMMEDIATE takes the write
+        # lock up front, so workers creating the tables of one shard wait for each other.
+        cursor.execute("BEGIN IMMEDIATE")
+        migrate_tables(cursor)
         create_block_tables(cursor)
         create_transaction_tables(cursor)
+        create_mempool_tables(cursor)
+        create_rollup_tables(cursor)
         conn.commit()
     except Exception as e:
-        logger.error(f"Error while creating tables, rolling back: {e}")
+        logger.error("Error while creating tables, rolling back: %s", e)
         conn.rollback()
+        raise
     finally:
         conn.close()
+
+
+def staging_table(table_name: str) -> str:
+    return f"{table_name}{STAGING_SUFFIX}"
+
+
+def create_staging_tables(cursor: sqlite3.Cursor):
+    """Creating unindexed, constraint free copies of the bulk loaded tables."""
+    for table_name in STAGED_TABLES:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {staging_table(table_name)} "
+            f"AS SELECT * FROM {table_name} WHERE 0"
+        )
+    # Witness stacks are staged per transaction and packed into one archive per block when the
+    # bulk load finishes (see etl.load.pack_staged_witness_archives).
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {staging_table(TABLE_WITNESS_ARCHIVE)} (
+            height INTEGER NOT NULL,
+            tx_id TEXT NOT NULL,
+            stacks TEXT NOT NULL
+        )
+    """
+    )
+
+    logger.info("Staging tables created.")
+
+
+def merge_staging_tables(cursor: sqlite3.Cursor) -> dict[str, int]:
+    """
+    Moves the staged rows into their final tables in key order.
+
+    Inserting in key order appends to the primary key B-trees instead of splitting random pages.
+    Secondary indexes of the tables are dropped for the merge and rebuilt from the sorted tables
+    afterwards, so they are not updated in random order row by row either. Run it in a
+    transaction so a failed merge restores them.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+
+    Returns:
+        dict: The number of rows merged, keyed by table name.
+    """
+    cursor.execute(
+        f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL
+            AND tbl_name IN ({", ".join("?" * len(STAGED_TABLES))})
+    """,
+        tuple(STAGED_TABLES),
+    )
+    indexes = cursor.fetchall()
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+
+    merged = {}
+    for table_name, order_by in STAGED_TABLES.items():
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {table_name} "
+            f"SELECT * FROM {staging_table(table_name)} ORDER BY {order_by}"
+        )
+        merged[table_name] = cursor.rowcount
+        logger.debug("Merged %s rows into table '%s'.", merged[table_name], table_name)
+
+    for name, sql in indexes:
+        cursor.execute(sql)
+        logger.debug("Rebuilt index '%s'.", name)
+
+    return merged
+
+
+def check_staged_foreign_keys(cursor: sqlite3.Cursor, table_names: list[str]) -> dict[str, int]:
+    """
+    Checks that the staged rows of the given tables reference existing parent rows.
+
+    Only the staged rows are checked, through the index of the parent key, so the check costs
+    as much as the load and does not report rows of earlier loads again. Run it after merging,
+    when staged parents are in their tables, and before dropping the staging tables.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        table_names (list): The staged tables to check.
+
+    Returns:
+        dict: The number of violating staged rows keyed by "<table> -> <parent table>".
+    """
+    violations = {}
+    for table_name in table_names:
+        foreign_keys = cursor.execute(f"PRAGMA foreign_key_list({table_name})").fetchall()
+        for _, _, parent, column, parent_column, *_ in foreign_keys:
+            cursor.execute(
+                f"""
+                SELECT COUNT(*) FROM {staging_table(table_name)} c
+                WHERE c.{column} IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM {parent} p WHERE p.{parent_column} = c.{column}
+                )
+            """
+            )
+            count = cursor.fetchone()[0]
+            if count:
+                key = f"{table_name} -> {parent}"
+                violations[key] = violations.get(key, 0) + count
+
+    return violations
+
+
+def drop_staging_tables(cursor: sqlite3.Cursor):
+    """Dropping the staging tables of a finished bulk load."""
+    for table_name in STAGED_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_table(table_name)}")
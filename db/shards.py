@@ -0,0 +1,176 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from common.config import MAX_ATTACHED_SHARDS, SHARD_NAME_FORMAT, SHARD_SIZE
+from common.logger import setup_logger
+from db.database import UNSHARDED_TABLES, create_mempool_tables, create_rollup_tables
+
+logger = setup_logger(__name__)
+
+
+def shard_start(height: int, shard_size: int = SHARD_SIZE) -> int:
+    """Returns the first height of the shard containing the height."""
+    return height - height % shard_size
+
+
+def shard_path(height: int, directory: str = ".", shard_size: int = SHARD_SIZE) -> str:
+    """Returns the path of the shard database file containing the height."""
+    return os.path.join(
+        directory, SHARD_NAME_FORMAT.format(start_height=shard_start(height, shard_size))
+    )
+
+
+def shard_ranges(
+    start_height: int, end_height: int, shard_size: int = SHARD_SIZE
+) -> list[tuple[int, int]]:
+    """
+    Splits a height range at shard boundaries.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        shard_size (int): The number of heights per shard.
+
+    Returns:
+        list: The (start height, end height) pairs, one per shard, both inclusive.
+    """
+    ranges = []
+    height = start_height
+    while height <= end_height:
+        last = min(shard_start(height, shard_size) + shard_size - 1, end_height)
+        ranges.append((height, last))
+        height = last + 1
+    return ranges
+
+
+def existing_shard_paths(
+    start_height: int, end_height: int, directory: str = ".", shard_size: int = SHARD_SIZE
+) -> list[str]:
+    """Returns the paths of the shard files covering the height range that exist on disk."""
+    paths = [
+        shard_path(start, directory, shard_size)
+        for start, _ in shard_ranges(start_height, end_height, shard_size)
+    ]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _read_only_uri(path: str) -> str:
+    return f"file:{os.path.abspath(path)}?mode=ro"
+
+
+@contextmanager
+def attached_shards(
+    start_height: int,
+    end_height: int,
+    directory: str = ".",
+    shard_size: int = SHARD_SIZE,
+    rollups: bool = False,
+):
+    """
+    Yields a connection on which every table name is a view over all shards of the range.
+
+    The shards are attached read-only and each table partitioned by height is exposed as a TEMP
+    view that is the UNION ALL of that table in every shard, so range queries can be written as
+    for a single database. Rollup and mempool tables (UNSHARDED_TABLES) are not merged, as a
+    rollup bucket crossing a shard boundary is split between two files and would be counted
+    twice. They are created empty in the connection's in-memory database instead, which hides
+    the tables of the shards.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        directory (str): The directory of the shard files.
+        shard_size (int): The number of heights per shard.
+        rollups (bool): Whether to recompute the rollup tables over the union of the shards, in
+            the connection's in-memory database. Buckets at the ends of the attached shards only
+            cover the blocks that are attached.
+
+    Raises:
+        ValueError: If the range spans more shards than can be attached, use fan_out_query.
+    """
+    paths = existing_shard_paths(start_height, end_height, directory, shard_size)
+    if len(paths) > MAX_ATTACHED_SHARDS:
+        raise ValueError(
+            f"{len(paths)} shards cover heights {start_height} to {end_height}, "
+            f"at most {MAX_ATTACHED_SHARDS} can be attached."
+        )
+
+    conn = sqlite3.connect("file::memory:", uri=True)
+    try:
+        for index, path in enumerate(paths):
+            conn.execute(f"ATTACH DATABASE ? AS shard_{index}", (_read_only_uri(path),))
+
+        if paths:
+            table_names = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM shard_0.sqlite_master "
+                    "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )
+            ]
+            for table_name in table_names:
+                if table_name in UNSHARDED_TABLES:
+                    continue
+                union = " UNION ALL ".join(
+                    f"SELECT * FROM shard_{index}.{table_name}" for index in range(len(paths))
+                )
+                conn.execute(f"CREATE TEMP VIEW {table_name} AS {union}")
+
+            cursor = conn.cursor()
+            create_mempool_tables(cursor)
+            create_rollup_tables(cursor)
+            if rollups:
+                from etl.rollup import rebuild_rollups_for_heights
+
+                rebuild_rollups_for_heights(cursor, start_height, end_height)
+            conn.commit()
+
+        logger.debug(
+            "Attached %s shards for heights %s to %s.", len(paths), start_height, end_height
+        )
+        yield conn
+    finally:
+        conn.close()
+
+
+def _query_shard(path: str, sql: str, parameters: tuple) -> list[tuple]:
+    conn = sqlite3.connect(_read_only_uri(path), uri=True)
+    try:
+        return conn.execute(sql, parameters).fetchall()
+    finally:
+        conn.close()
+
+
+def fan_out_query(
+    sql: str,
+    parameters: tuple,
+    start_height: int,
+    end_height: int,
+    directory: str = ".",
+    shard_size: int = SHARD_SIZE,
+) -> list[tuple]:
+    """
+    Runs a query on every shard of a height range concurrently and concatenates the rows.
+
+    Aggregates are computed per shard; combine them in the caller (e.g. sum the per shard sums).
+
+    Parameters:
+        sql (str): The query.
+        parameters (tuple): The query parameters.
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        directory (str): The directory of the shard files.
+        shard_size (int): The number of heights per shard.
+
+    Returns:
+        list: The rows of all shards, in shard order.
+    """
+    paths = existing_shard_paths(start_height, end_height, directory, shard_size)
+    if not paths:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        results = executor.map(lambda path: _query_shard(path, sql, parameters), paths)
+        return [row for rows in results for row in rows]
@@ -0,0 +1,388 @@
+import argparse
+import sys
+import threading
+import time
+
+from common import metrics
+from common.config import (
+    COORDINATOR_DB_NAME,
+    HEARTBEAT_INTERVAL,
+    LEASE_SIZE,
+    LEASE_TIMEOUT,
+    MAX_LEASE_ATTEMPTS,
+    MODEL_DECODING,
+    SHARD_SIZE,
+    TABLE_LEASES,
+    LeaseStatus,
+    ModelDecoding,
+)
+from common.logger import setup_logger
+from db.database import create_coordination_tables, create_tables
+from db.shards import shard_path, shard_ranges
+from etl.load import db_cursor
+from util.utils import set_base_url, set_model_decoding
+
+logger = setup_logger(__name__)
+
+
+def create_leases(
+    start_height: int,
+    end_height: int,
+    coordinator_db: str = COORDINATOR_DB_NAME,
+    shard_size: int = SHARD_SIZE,
+    lease_size: int = LEASE_SIZE,
+) -> int:
+    """
+    Queues a height range for distributed backfill as leases of lease_size heights.
+
+    Leases never cross a shard boundary, but a shard is split into several leases, so more
+    workers than shards can load in parallel and a failed lease only restarts its own heights.
+    The workers of one shard share its file, SQLite serializes their block transactions.
+    Ranges already queued are left untouched, so queue them again with the same sizes.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        coordinator_db (str): The coordination database shared by the workers.
+        shard_size (int): The number of heights per shard.
+        lease_size (int): The number of heights per lease, capped at shard_size.
+
+    Returns:
+        int: The number of leases created.
+
+    Raises:
+        ValueError: If the lease size does not divide the shard size.
+    """
+    lease_size = min(lease_size, shard_size)
+    if shard_size % lease_size:
+        raise ValueError(
+            f"The lease size {lease_size} does not divide the shard size {shard_size}."
+        )
+
+    with db_cursor(coordinator_db) as (conn, cursor):
+        create_coordination_tables(cursor)
+        cursor.executemany(
+            f"""
+            INSERT OR IGNORE INTO {TABLE_LEASES} (start_height, end_height, status)
+            VALUES (?, ?, ?)
+        """,
+            [
+                (start, end, LeaseStatus.PENDING.value)
+                # Aligned to multiples of the lease size, which divides the shard size.
+                for start, end in shard_ranges(start_height, end_height, lease_size)
+            ],
+        )
+        created = cursor.rowcount
+    logger.info("Created %s leases for heights %s to %s.", created, start_height, end_height)
+    return created
+
+
+def claim_lease(
+    worker_id: str,
+    coordinator_db: str = COORDINATOR_DB_NAME,
+    lease_timeout: float = LEASE_TIMEOUT,
+    max_attempts: int = MAX_LEASE_ATTEMPTS,
+) -> tuple[int, int] | None:
+    """
+    Atomically claims a pending lease, or one whose holder stopped heartbeating.
+
+    Leases claimed the fewest times go first, then the lowest heights, so a lease that keeps
+    failing is retried after the others. An expired lease that already used up its attempts
+    is marked failed instead of being claimed again.
+
+    Parameters:
+        worker_id (str): The ID of the claiming worker.
+        coordinator_db (str): The coordination database shared by the workers.
+        lease_timeout (float): Seconds without heartbeat after which a lease is up for grabs.
+        max_attempts (int): The number of claims after which a lease is given up on.
+
+    Returns:
+        tuple | None: The (start height, end height) of the claimed lease, None if none is left.
+    """
+    now = time.time()
+    with db_cursor(coordinator_db) as (conn, cursor):
+        cursor.execute(
+            f"""
+            UPDATE {TABLE_LEASES}
+            SET status = ?, worker_id = NULL, heartbeat_at = NULL,
+                last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = ? AND heartbeat_at < ? AND attempts >= ?
+        """,
+            (LeaseStatus.FAILED.value, LeaseStatus.LEASED.value, now - lease_timeout, max_attempts),
+        )
+        cursor.execute(
+            f"""
+            UPDATE {TABLE_LEASES}
+            SET status = ?, worker_id = ?, heartbeat_at = ?, attempts = attempts + 1
+            WHERE start_height = (
+                SELECT start_height FROM {TABLE_LEASES}
+                WHERE (status = ? OR (status = ? AND heartbeat_at < ?)) AND attempts < ?
+                ORDER BY attempts, start_height
+                LIMIT 1
+            )
+            RETURNING start_height, end_height
+        """,
+            (
+                LeaseStatus.LEASED.value,
+                worker_id,
+                now,
+                LeaseStatus.PENDING.value,
+                LeaseStatus.LEASED.value,
+                now - lease_timeout,
+                max_attempts,
+            ),
+        )
+        return cursor.fetchone()
+
+
+def heartbeat(worker_id: str, start_height: int, coordinator_db: str = COORDINATOR_DB_NAME) -> bool:
+    """
+    Extends a lease held by the worker.
+
+    Returns:
+        bool: False if the lease has expired and was taken over by another worker.
+    """
+    with db_cursor(coordinator_db) as (conn, cursor):
+        cursor.execute(
+            f"""
+            UPDATE {TABLE_LEASES} SET heartbeat_at = ?
+            WHERE start_height = ? AND worker_id = ? AND status = ?
+        """,
+            (time.time(), start_height, worker_id, LeaseStatus.LEASED.value),
+        )
+        return cursor.rowcount == 1
+
+
+def complete_lease(
+    worker_id: str, start_height: int, coordinator_db: str = COORDINATOR_DB_NAME
+) -> bool:
+    """
+    Marks a lease held by the worker as done.
+
+    Returns:
+        bool: False if the lease was no longer held by the worker.
+    """
+    with db_cursor(coordinator_db) as (conn, cursor):
+        cursor.execute(
+            f"""
+            UPDATE {TABLE_LEASES} SET status = ?, completed_at = ?
+            WHERE start_height = ? AND worker_id = ? AND status = ?
+        """,
+            (
+                LeaseStatus.DONE.value,
+                time.time(),
+                start_height,
+                worker_id,
+                LeaseStatus.LEASED.value,
+            ),
+        )
+        return cursor.rowcount == 1
+
+
+def release_lease(
+    worker_id: str,
+    start_height: int,
+    coordinator_db: str = COORDINATOR_DB_NAME,
+    error: str | None = None,
+    max_attempts: int = MAX_LEASE_ATTEMPTS,
+) -> LeaseStatus | None:
+    """
+    Returns a lease held by the worker to the queue after a failure, or marks it failed once
+    it has been claimed max_attempts times.
+
+    Parameters:
+        worker_id (str): The ID of the releasing worker.
+        start_height (int): The first height of the lease.
+        coordinator_db (str): The coordination database shared by the workers.
+        error (str | None): The reason of the failure, kept in last_error.
+        max_attempts (int): The number of claims after which a lease is given up on.
+
+    Returns:
+        LeaseStatus | None: The new status, None if the lease was no longer held by the worker.
+    """
+    with db_cursor(coordinator_db) as (conn, cursor):
+        cursor.execute(
+            f"""
+            UPDATE {TABLE_LEASES}
+            SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                worker_id = NULL, heartbeat_at = NULL, last_error = ?
+            WHERE start_height = ? AND worker_id = ? AND status = ?
+            RETURNING status
+        """,
+            (
+                max_attempts,
+                LeaseStatus.FAILED.value,
+                LeaseStatus.PENDING.value,
+                error,
+                start_height,
+                worker_id,
+                LeaseStatus.LEASED.value,
+            ),
+        )
+        row = cursor.fetchone()
+        return LeaseStatus(row[0]) if row is not None else None
+
+
+def lease_status(coordinator_db: str = COORDINATOR_DB_NAME) -> dict[str, int]:
+    """Returns the number of leases per status."""
+    with db_cursor(coordinator_db) as (conn, cursor):
+        cursor.execute(f"SELECT status, COUNT(*) FROM {TABLE_LEASES} GROUP BY status")
+        return dict(cursor.fetchall())
+
+
+def _heartbeat_until(
+    stopped: threading.Event,
+    lost: threading.Event,
+    worker_id: str,
+    start_height: int,
+    coordinator_db: str,
+    interval: float,
+) -> None:
+    while not stopped.wait(interval):
+        try:
+            if not heartbeat(worker_id, start_height, coordinator_db):
+                logger.warning("Worker %s lost lease %s.", worker_id, start_height)
+                lost.set()
+                return
+        except Exception as e:
+            logger.error("Worker %s failed to heartbeat lease %s: %s", worker_id, start_height, e)
+
+
+def run_worker(
+    worker_id: str,
+    node_url: str,
+    coordinator_db: str = COORDINATOR_DB_NAME,
+    shard_directory: str = ".",
+    shard_size: int = SHARD_SIZE,
+    lease_timeout: float = LEASE_TIMEOUT,
+    heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    max_attempts: int = MAX_LEASE_ATTEMPTS,
+) -> int:
+    """
+    Claims leases and loads their heights into their shard until no lease is left.
+
+    While a lease is being loaded a background thread heartbeats it, so the lease only
+    expires, and is handed to another worker, if this worker dies or hangs. If a heartbeat
+    finds the lease taken over anyway, loading stops after the current block and the lease is
+    left to its new holder.
+
+    Parameters:
+        worker_id (str): The unique ID of this worker.
+        node_url (str): The base URL of the API of the node to extract from.
+        coordinator_db (str): The coordination database shared by the workers.
+        shard_directory (str): The directory of the shard files.
+        shard_size (int): The number of heights per shard, as used for create_leases.
+        lease_timeout (float): Seconds without heartbeat after which a lease expires.
+        heartbeat_interval (float): Seconds between two heartbeats.
+        max_attempts (int): The number of claims after which a failing lease is given up on.
+
+    Returns:
+        int: The number of leases completed by this worker.
+    """
+    # Imported here so that the init and status commands start without the extract stack.
+    from etl.pipeline import load_blocks
+
+    set_base_url(node_url)
+    completed = 0
+    while (
+        lease := claim_lease(worker_id, coordinator_db, lease_timeout, max_attempts)
+    ) is not None:
+        start_height, end_height = lease
+        logger.info("Worker %s claimed heights %s to %s.", worker_id, start_height, end_height)
+
+        stopped, lost = threading.Event(), threading.Event()
+        heartbeat_thread = threading.Thread(
+            target=_heartbeat_until,
+            args=(stopped, lost, worker_id, start_height, coordinator_db, heartbeat_interval),
+            daemon=True,
+        )
+        heartbeat_thread.start()
+        try:
+            schema_name = shard_path(start_height, shard_directory, shard_size)
+            create_tables(schema_name)
+            load_blocks(start_height, end_height, schema_name, stop=lost)
+        except Exception as e:
+            status = release_lease(worker_id, start_height, coordinator_db, str(e), max_attempts)
+            logger.error(
+                "Worker %s failed on lease %s, now %s: %s",
+                worker_id,
+                start_height,
+                status.value if status is not None else "lost",
+                e,
+            )
+            continue
+        finally:
+            stopped.set()
+            heartbeat_thread.join()
+
+        if lost.is_set():
+            logger.warning("Worker %s abandoned lease %s after losing it.", worker_id, start_height)
+        elif complete_lease(worker_id, start_height, coordinator_db):
+            completed += 1
+        else:
+            logger.warning("Worker %s finished lease %s after losing it.", worker_id, start_height)
+
+    logger.info("Worker %s found no more leases after completing %s.", worker_id, completed)
+    return completed
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m etl.coordinator", description="Distributed backfill through leases."
+    )
+    parser.add_argument("--coordinator-db", default=COORDINATOR_DB_NAME)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--lease-size", type=int, default=LEASE_SIZE)
+    parser.add_argument("--max-attempts", type=int, default=MAX_LEASE_ATTEMPTS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="queue a height range")
+    init.add_argument("start_height", type=int)
+    init.add_argument("end_height", type=int)
+
+    worker = commands.add_parser("worker", help="load leases until none is left")
+    worker.add_argument("--worker-id", required=True)
+    worker.add_argument("--node-url", required=True)
+    worker.add_argument("--shard-directory", default=".")
+    worker.add_argument(
+        "--model-decoding",
+        choices=[decoding.value for decoding in ModelDecoding],
+        default=MODEL_DECODING.value,
+        help="how transaction pages are decoded, compare with python -m bench.decode",
+    )
+    worker.add_argument(
+        "--metrics-port",
+        type=int,
+        help="record metrics and expose them on this port for Prometheus (/metrics)",
+    )
+
+    commands.add_parser("status", help="show the number of leases per status")
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        create_leases(
+            args.start_height,
+            args.end_height,
+            args.coordinator_db,
+            args.shard_size,
+            args.lease_size,
+        )
+    elif args.command == "worker":
+        set_model_decoding(ModelDecoding(args.model_decoding))
+        if args.metrics_port is not None:
+            metrics.enable()
+            metrics.serve(args.metrics_port)
+        run_worker(
+            args.worker_id,
+            args.node_url,
+            args.coordinator_db,
+            args.shard_directory,
+            args.shard_size,
+            max_attempts=args.max_attempts,
+        )
+    else:
+        print(lease_status(args.coordinator_db))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
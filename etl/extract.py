@@ -1,13 +1,25 @@
 from datetime import datetime
+from typing import TypeVar
 
-from common.config import DATETIME_FORMAT, Api
+from pydantic import BaseModel
+
+from common import metrics
+from common.config import DATETIME_FORMAT, TXS_PAGE_SIZE, Api
 from common.logger import setup_logger
 from model.block import Block
+from model.mempool import Mempool
 from model.transaction import Transaction
-from util.utils import api_builder, fetch_json, fetch_text
+from util.utils import api_builder, decode_models, fetch_bytes, fetch_json, fetch_text
 
 logger = setup_logger(__name__)
 
+M = TypeVar("M", bound=BaseModel)
+
+
+def _validate(model: type[M], data) -> M:
+    with metrics.timer("validation_seconds", model=model.__name__):
+        return model.model_validate(data)
+
 
 def get_block_hash_by_height(height_of_block: int) -> str:
     """
@@ -22,7 +34,7 @@ def get_block_hash_by_height(height_of_block: int) -> str:
     Raises:
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
-    logger.debug(f"Getting block hash {height_of_block}.")
+    logger.debug("Getting block hash %s.", height_of_block)
     return fetch_text(api_builder(Api.BLOCK_BY_HEIGHT, height_of_block))
 
 
@@ -40,10 +52,10 @@ def get_block_by_timestamp(timestamp: int) -> Block:
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
     logger.debug(
-        f"Getting block closest to {datetime.fromtimestamp(timestamp).strftime(DATETIME_FORMAT)}."
+        "Getting block closest to %s.", datetime.fromtimestamp(timestamp).strftime(DATETIME_FORMAT)
     )
     json_response = fetch_json(api_builder(Api.BLOCK_BY_TIMESTAMP, timestamp))
-    logger.debug(f"Got block meta at height {json_response["height"]}.")
+    logger.debug("Got block meta at height %s.", json_response["height"])
     return Block.model_validate(get_block_by_hash(json_response["hash"]))
 
 
@@ -60,8 +72,8 @@ def get_block_by_hash(hash_of_block: str) -> Block:
     Raises:
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
-    logger.debug(f"Getting block by hash {hash_of_block}.")
-    return Block.model_validate(fetch_json(api_builder(Api.BLOCK_BY_HASH, hash_of_block)))
+    logger.debug("Getting block by hash %s.", hash_of_block)
+    return _validate(Block, fetch_json(api_builder(Api.BLOCK_BY_HASH, hash_of_block)))
 
 
 def get_block_by_height(height_of_block: int) -> Block:
@@ -77,7 +89,7 @@ def get_block_by_height(height_of_block: int) -> Block:
     Raises:
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
-    logger.debug(f"Getting block {height_of_block}.")
+    logger.debug("Getting block %s.", height_of_block)
     block_hash = get_block_hash_by_height(height_of_block)
     return Block.model_validate(get_block_by_hash(block_hash))
 
@@ -101,10 +113,10 @@ def get_block_batch(start_height: int = None) -> list[Block]:
         logger.debug("Getting 10 latest blocks.")
         response = fetch_json(api_builder(Api.BLOCKS))
     else:
-        logger.debug(f"Getting blocks between height {start_height} and {start_height - 9}.")
+        logger.debug("Getting blocks between height %s and %s.", start_height, start_height - 9)
         response = fetch_json(api_builder(Api.BLOCKS, start_height))
 
-    return [Block.model_validate(block) for block in response]
+    return [_validate(Block, block) for block in response]
 
 
 def get_transaction_ids(hash_of_block: str) -> list[str]:
@@ -120,7 +132,7 @@ def get_transaction_ids(hash_of_block: str) -> list[str]:
     Raises:
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
-    logger.debug(f"Getting all transaction IDs from block by hash {hash_of_block}.")
+    logger.debug("Getting all transaction IDs from block by hash %s.", hash_of_block)
     return list(fetch_json(api_builder(Api.BLOCK_BY_HASH, hash_of_block, Api.TX_IDS_SEGMENT)))
 
 
@@ -139,12 +151,34 @@ def get_transactions_batch(hash_of_block: str, start_index: int = 0) -> list[Tra
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
     logger.debug(
-        f"Getting transactions from block from index {start_index} to index {start_index + 9}."
+        "Getting transactions from block from index %s to index %s.", start_index, start_index + 9
     )
-    response = fetch_json(
-        api_builder(Api.BLOCK_BY_HASH, hash_of_block, Api.TXS_SEGMENTS, start_index)
+    raw = fetch_bytes(api_builder(Api.BLOCK_BY_HASH, hash_of_block, Api.TXS_SEGMENTS, start_index))
+    with metrics.timer("validation_seconds", model=Transaction.__name__):
+        return decode_models(list[Transaction], raw)
+
+
+def get_transactions_batch_raw(hash_of_block: str, start_index: int = 0) -> bytes:
+    """
+    Returns the undecoded JSON response of get_transactions_batch, e.g. to be decoded
+    in another process (see etl.transform.decode_transactions_batch).
+
+    Parameters:
+        hash_of_block (str): The hash of the block.
+        start_index (int): The index of the first transaction to retrieve.
+
+    Returns:
+        bytes: The JSON array of up to 10 transactions beginning at start_index.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    logger.debug(
+        "Getting raw transactions from block from index %s to index %s.",
+        start_index,
+        start_index + 9,
     )
-    return [Transaction.model_validate(transaction) for transaction in response]
+    return fetch_bytes(api_builder(Api.BLOCK_BY_HASH, hash_of_block, Api.TXS_SEGMENTS, start_index))
 
 
 def get_all_transactions_from_block(hash_of_block: str) -> list[Transaction]:
@@ -160,11 +194,56 @@ def get_all_transactions_from_block(hash_of_block: str) -> list[Transaction]:
     Raises:
         requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
     """
-    logger.debug(f"Getting all transactions from block by hash {hash_of_block}.")
+    logger.debug("Getting all transactions from block by hash %s.", hash_of_block)
     all_transactions = []
     block = get_block_by_hash(hash_of_block)
-    logger.info(f"Fetching {block.tx_count} transactions from block {block.height}.")
-    for i in range(0, block.tx_count, 10):
+    logger.debug("Fetching %s transactions from block %s.", block.tx_count, block.height)
+    for i in range(0, block.tx_count, TXS_PAGE_SIZE):
         transactions = get_transactions_batch(hash_of_block, i)
         all_transactions.extend(transaction for transaction in transactions)
     return all_transactions
+
+
+def get_transaction(tx_id: str) -> Transaction:
+    """
+    Returns the details of the transaction with the given ID.
+
+    Parameters:
+        tx_id (str): The ID of the transaction.
+
+    Returns:
+        Transaction: The details of the transaction.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    logger.debug("Getting transaction %s.", tx_id)
+    return _validate(Transaction, fetch_json(api_builder(Api.TX, tx_id)))
+
+
+def get_mempool() -> Mempool:
+    """
+    Returns the summary of the current mempool, including its fee histogram.
+
+    Returns:
+        Mempool: The mempool summary.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    logger.debug("Getting mempool summary.")
+    return _validate(Mempool, fetch_json(api_builder(Api.MEMPOOL)))
+
+
+def get_mempool_transaction_ids() -> list[str]:
+    """
+    Returns the IDs of all transactions currently in the mempool.
+
+    Returns:
+        list: The transaction IDs.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    logger.debug("Getting mempool transaction IDs.")
+    return fetch_json(api_builder(Api.MEMPOOL_TX_IDS))
@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+from common.config import DB_NAME, GRAPH_DIRECTORY, TABLE_TRANSACTIONS, TABLE_TX_INPUTS
+from common.logger import ProgressLogger, setup_logger
+from etl.load import db_cursor
+
+logger = setup_logger(__name__)
+
+INDPTR_FILE = "indptr.bin"
+INDICES_FILE = "indices.bin"
+TX_IDS_FILE = "tx_ids.bin"
+NODES_FILE = "nodes.db"
+META_FILE = "meta.json"
+
+INDPTR_DTYPE = np.int64
+INDICES_DTYPE = np.uint32
+TX_ID_BYTES = 32
+
+
+def _read_meta(directory: str) -> dict:
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return {"last_height": None, "node_count": 0, "edge_count": 0}
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_meta(directory: str, meta: dict) -> None:
+    path = os.path.join(directory, META_FILE)
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(
+            {
+                **meta,
+                "indptr_dtype": np.dtype(INDPTR_DTYPE).name,
+                "indices_dtype": np.dtype(INDICES_DTYPE).name,
+            },
+            file,
+        )
+    os.replace(f"{path}.tmp", path)
+
+
+def _open_nodes(directory: str, node_count: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(directory, NODES_FILE))
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS nodes (tx_id TEXT PRIMARY KEY, node_id INTEGER NOT NULL) "
+        "WITHOUT ROWID"
+    )
+    # Forget nodes of an export that crashed before its metadata was written.
+    conn.execute("DELETE FROM nodes WHERE node_id >= ?", (node_count,))
+    conn.commit()
+    return conn
+
+
+def _truncate(path: str, size: int) -> None:
+    with open(path, "ab") as file:
+        file.truncate(size)
+
+
+def _export_height(
+    cursor: sqlite3.Cursor, nodes: sqlite3.Connection, height: int, meta: dict, files: dict
+) -> None:
+    cursor.execute(
+        f"SELECT tx_id FROM {TABLE_TRANSACTIONS} WHERE block_height = ? ORDER BY tx_id", (height,)
+    )
+    block_tx_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        f"""
+        SELECT tx_id, prev_tx_id FROM {TABLE_TX_INPUTS}
+        WHERE tx_id IN (SELECT tx_id FROM {TABLE_TRANSACTIONS} WHERE block_height = ?)
+            AND NOT is_coinbase
+    """,
+        (height,),
+    )
+    funding = {}
+    for tx_id, prev_tx_id in cursor.fetchall():
+        funding.setdefault(tx_id, set()).add(prev_tx_id)
+
+    known = {}
+    referenced = set(block_tx_ids).union(*funding.values())
+    for tx_id, node_id in nodes.execute(
+        "SELECT tx_id, node_id FROM nodes WHERE tx_id IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(referenced)),),
+    ):
+        known[tx_id] = node_id
+
+    # New nodes get consecutive IDs: first the block's transactions, which carry the edges,
+    # then funding transactions from before the exported range, which stay leaves.
+    new_tx_ids = [tx_id for tx_id in block_tx_ids if tx_id not in known]
+    new_tx_ids += sorted({tx_id for tx_id in referenced - known.keys() if tx_id not in new_tx_ids})
+    if not new_tx_ids:
+        return
+
+    first_node_id = meta["node_count"]
+    for offset, tx_id in enumerate(new_tx_ids):
+        known[tx_id] = first_node_id + offset
+    nodes.executemany(
+        "INSERT INTO nodes (tx_id, node_id) VALUES (?, ?)",
+        [(tx_id, known[tx_id]) for tx_id in new_tx_ids],
+    )
+
+    indptr = []
+    indices = []
+    edge_count = meta["edge_count"]
+    for tx_id in new_tx_ids:
+        neighbours = sorted(known[prev_tx_id] for prev_tx_id in funding.get(tx_id, ()))
+        indices.extend(neighbours)
+        edge_count += len(neighbours)
+        indptr.append(edge_count)
+
+    np.asarray(indices, dtype=INDICES_DTYPE).tofile(files[INDICES_FILE])
+    np.asarray(indptr, dtype=INDPTR_DTYPE).tofile(files[INDPTR_FILE])
+    files[TX_IDS_FILE].write(b"".join(bytes.fromhex(tx_id) for tx_id in new_tx_ids))
+    meta["node_count"] += len(new_tx_ids)
+    meta["edge_count"] = edge_count
+
+
+def export_graph(
+    directory: str = GRAPH_DIRECTORY, end_height: int | None = None, schema_name: str = DB_NAME
+) -> dict:
+    """
+    Appends the transactions of newly loaded heights to the CSR transaction graph export.
+
+    The graph has one node per transaction and an edge from every transaction to each
+    transaction it spends from; coinbase inputs have no edge. It is stored as raw arrays that
+    can be memory mapped with open_graph: indptr (node_count + 1 offsets) and indices (funding
+    node IDs), plus the transaction ID of every node. Heights are exported in order, continuing
+    after the last exported height up to the first height that is not loaded yet, so node IDs
+    only ever grow and rows are appended. Funding transactions below the exported range become
+    leaf nodes.
+
+    Parameters:
+        directory (str): The directory of the export.
+        end_height (int | None): The last height to export, defaults to the highest loaded one.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        dict: The export metadata: last height, node count and edge count.
+    """
+    os.makedirs(directory, exist_ok=True)
+    meta = _read_meta(directory)
+
+    paths = {
+        name: os.path.join(directory, name) for name in (INDPTR_FILE, INDICES_FILE, TX_IDS_FILE)
+    }
+    # Drop whatever a crashed export appended after the metadata was last written.
+    _truncate(paths[INDPTR_FILE], (meta["node_count"] + 1) * np.dtype(INDPTR_DTYPE).itemsize)
+    _truncate(paths[INDICES_FILE], meta["edge_count"] * np.dtype(INDICES_DTYPE).itemsize)
+    _truncate(paths[TX_IDS_FILE], meta["node_count"] * TX_ID_BYTES)
+
+    nodes = _open_nodes(directory, meta["node_count"])
+    try:
+        with db_cursor(schema_name) as (conn, cursor):
+            cursor.execute(
+                f"SELECT DISTINCT block_height FROM {TABLE_TRANSACTIONS} "
+                "WHERE block_height > ? AND block_height <= ? ORDER BY block_height",
+                (
+                    -1 if meta["last_height"] is None else meta["last_height"],
+                    end_height if end_height is not None else 2**63 - 1,
+                ),
+            )
+            heights = [row[0] for row in cursor.fetchall()]
+            if meta["last_height"] is not None:
+                heights.insert(0, meta["last_height"])
+            # Stop at the first height that is not loaded yet, it must not be skipped later.
+            contiguous = next(
+                (i for i in range(1, len(heights)) if heights[i] != heights[i - 1] + 1),
+                len(heights),
+            )
+            heights = heights[1 if meta["last_height"] is not None else 0 : contiguous]
+            if not heights:
+                return meta
+            logger.info("Exporting graph of heights %s to %s.", heights[0], heights[-1])
+
+            progress = ProgressLogger(logger)
+            files = {name: open(path, "ab") for name, path in paths.items()}
+            try:
+                for height in heights:
+                    nodes_before = meta["node_count"]
+                    _export_height(cursor, nodes, height, meta, files)
+                    progress.add(blocks=1, nodes=meta["node_count"] - nodes_before)
+            finally:
+                for file in files.values():
+                    file.close()
+
+        nodes.commit()
+        meta["last_height"] = heights[-1]
+        _write_meta(directory, meta)
+    finally:
+        nodes.close()
+
+    logger.info(
+        "Graph exported up to height %s: %s nodes, %s edges.",
+        meta["last_height"],
+        meta["node_count"],
+        meta["edge_count"],
+    )
+    return meta
+
+
+class TransactionGraph:
+    """Memory mapped, read-only view of a graph exported by export_graph.
+
+    Attributes:
+        indptr (np.memmap): Row offsets; the funding nodes of node n are
+            indices[indptr[n]:indptr[n + 1]].
+        indices (np.memmap): Funding node IDs of all nodes, row after row.
+        tx_ids (np.memmap): The 32 byte transaction ID of every node.
+    """
+
+    def __init__(self, directory: str = GRAPH_DIRECTORY):
+        self.directory = directory
+        meta = _read_meta(directory)
+        self.indptr = self._map(INDPTR_FILE, INDPTR_DTYPE, meta["node_count"] + 1)
+        self.indices = self._map(INDICES_FILE, INDICES_DTYPE, meta["edge_count"])
+        self.tx_ids = self._map(TX_IDS_FILE, np.uint8, meta["node_count"] * TX_ID_BYTES).reshape(
+            -1, TX_ID_BYTES
+        )
+
+    def _map(self, name: str, dtype, count: int) -> np.ndarray:
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode="r", shape=(count,))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.indptr) - 1
+
+    def funding(self, node_id: int) -> np.ndarray:
+        """Returns the IDs of the nodes the given node spends from."""
+        return self.indices[self.indptr[node_id] : self.indptr[node_id + 1]]
+
+    def tx_id(self, node_id: int) -> str:
+        return bytes(self.tx_ids[node_id]).hex()
+
+    def node_id(self, tx_id: str) -> int | None:
+        conn = sqlite3.connect(os.path.join(self.directory, NODES_FILE))
+        try:
+            row = conn.execute("SELECT node_id FROM nodes WHERE tx_id = ?", (tx_id,)).fetchone()
+            return row[0] if row is not None else None
+        finally:
+            conn.close()
+
+
+def open_graph(directory: str = GRAPH_DIRECTORY) -> TransactionGraph:
+    """Memory maps the graph exported to the directory."""
+    return TransactionGraph(directory)
@@ -1,35 +1,67 @@
+import json
 import sqlite3
 from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
+from common import metrics
 from common.config import (
     DB_NAME,
+    TABLE_BLOCK_ROLLUPS,
     TABLE_BLOCKS,
     TABLE_COINBASE_ADDRESSES,
     TABLE_EXTRAS,
     TABLE_FEE_RANGE,
+    TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS,
+    TABLE_MEMPOOL_SNAPSHOTS,
+    TABLE_MEMPOOL_TX_DELTAS,
     TABLE_MINERS,
     TABLE_POOLS,
     TABLE_TRANSACTIONS,
-    TABLE_TX_INPUTS,
-    TABLE_TX_OUTPUTS,
-    TABLE_WITNESSES,
+    TABLE_WITNESS_ARCHIVE,
+    WITNESS_STORAGE,
+    WitnessStorage,
 )
 from common.logger import setup_logger
-from model.block import Block
-from model.transaction import Transaction
+from db.database import (
+    STAGED_TABLES,
+    check_staged_foreign_keys,
+    create_staging_tables,
+    drop_staging_tables,
+    merge_staging_tables,
+    staging_table,
+)
+from etl.rollup import (
+    add_block_to_rollups,
+    rebuild_rollups_for_heights,
+    remove_block_from_rollups,
+)
+from etl.transform import (
+    TRANSACTION_TABLE_COLUMNS,
+    WitnessArchive,
+    merge_rows,
+    pack_witness_stacks,
+    transaction_to_rows,
+)
+
+# The models are only needed for annotations, importing them would load pydantic.
+if TYPE_CHECKING:
+    from model.block import Block
+    from model.mempool import Mempool
+    from model.transaction import Transaction
 
 logger = setup_logger(__name__)
 
 
 @contextmanager
-def db_cursor(schema_name=DB_NAME):
+def db_cursor(schema_name=DB_NAME, foreign_keys: bool = True):
     conn = sqlite3.connect(schema_name)
-    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
     cursor = conn.cursor()
 
     try:
         yield conn, cursor
-        conn.commit()
+        with metrics.timer("sqlite_commit_seconds"):
+            conn.commit()
     except Exception:
         conn.rollback()
         raise
@@ -41,13 +73,21 @@ def db_cursor(schema_name=DB_NAME):
 def batch_insert(cursor: sqlite3.Cursor, table_name: str, columns: list[str], values: list[tuple]):
     placeholders = ", ".join(["?"] * len(columns))
     col_str = ", ".join(columns)
-    cursor.executemany(
-        f"INSERT OR REPLACE INTO {table_name} ({col_str}) VALUES ({placeholders})",
-        values,
-    )
+    with metrics.timer("sqlite_statement_seconds", table=table_name):
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {table_name} ({col_str}) VALUES ({placeholders})",
+            values,
+        )
+    metrics.increment("rows_inserted_total", len(values), table=table_name)
 
 
-def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
+def execute_insert(cursor: sqlite3.Cursor, table_name: str, sql: str, parameters: tuple):
+    with metrics.timer("sqlite_statement_seconds", table=table_name):
+        cursor.execute(sql, parameters)
+    metrics.increment("rows_inserted_total", table=table_name)
+
+
+def insert_block(block: "Block", schema_name: str = DB_NAME) -> None:
     """Inserts all details of a block into the database.
 
     Parameters:
@@ -56,7 +96,13 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
     """
     try:
         with db_cursor(schema_name) as (conn, cursor):
-            cursor.execute(
+            # A block loaded again, maybe with another timestamp, leaves its old buckets first.
+            with metrics.timer("sqlite_statement_seconds", table=TABLE_BLOCK_ROLLUPS):
+                remove_block_from_rollups(cursor, block.height)
+
+            execute_insert(
+                cursor,
+                TABLE_BLOCKS,
                 f"""
                 INSERT OR REPLACE INTO {TABLE_BLOCKS} (
                     id, height, version, timestamp, bits, nonce, difficulty, merkle_root,
@@ -80,9 +126,11 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
                     block.median_time,
                 ),
             )
-            logger.debug(f"Block {block.height} inserted into table '{TABLE_BLOCKS}'.")
+            logger.debug("Block %s inserted into table '%s'.", block.height, TABLE_BLOCKS)
 
-            cursor.execute(
+            execute_insert(
+                cursor,
+                TABLE_EXTRAS,
                 f"""
                 INSERT OR REPLACE INTO {TABLE_EXTRAS} (
                     height, header, reward, median_fee, total_fees, avg_fee, avg_fee_rate,
@@ -115,7 +163,9 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
                     block.extras.similarity,
                 ),
             )
-            logger.debug(f"Extras for block {block.height} inserted into table '{TABLE_EXTRAS}'.")
+            logger.debug(
+                "Extras for block %s inserted into table '%s'.", block.height, TABLE_EXTRAS
+            )
 
             batch_insert(
                 cursor,
@@ -124,7 +174,7 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
                 [(block.height, fee) for fee in block.extras.fee_range],
             )
             logger.debug(
-                f"Fee range for block {block.height} inserted into table '{TABLE_FEE_RANGE}'."
+                "Fee range for block %s inserted into table '%s'.", block.height, TABLE_FEE_RANGE
             )
 
             batch_insert(
@@ -134,11 +184,14 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
                 [(block.height, address) for address in block.extras.coinbase_addresses],
             )
             logger.debug(
-                f"Coinbase addresses for block {block.height}"
-                f" inserted into table '{TABLE_COINBASE_ADDRESSES}'."
+                "Coinbase addresses for block %s inserted into table '%s'.",
+                block.height,
+                TABLE_COINBASE_ADDRESSES,
             )
 
-            cursor.execute(
+            execute_insert(
+                cursor,
+                TABLE_POOLS,
                 f"""
                 INSERT OR REPLACE INTO {TABLE_POOLS} (height, id, name, slug)
                 VALUES (?, ?, ?, ?)
@@ -150,7 +203,7 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
                     block.extras.pool.slug,
                 ),
             )
-            logger.debug(f"Extras for block {block.height} inserted into table '{TABLE_POOLS}'.")
+            logger.debug("Extras for block %s inserted into table '%s'.", block.height, TABLE_POOLS)
 
             if block.extras.pool.miner_names is not None:
                 batch_insert(
@@ -160,129 +213,376 @@ def insert_block(block: Block, schema_name: str = DB_NAME) -> None:
                     [(block.height, miner_name) for miner_name in block.extras.pool.miner_names],
                 )
                 logger.debug(
-                    f"Miner names for block {block.height} inserted into table '{TABLE_MINERS}'."
+                    "Miner names for block %s inserted into table '%s'.", block.height, TABLE_MINERS
                 )
 
-            logger.info(f"Block {block.height} inserted into database.")
+            with metrics.timer("sqlite_statement_seconds", table=TABLE_BLOCK_ROLLUPS):
+                add_block_to_rollups(cursor, block.height)
+            logger.debug("Rollups for block %s updated.", block.height)
+
+            metrics.increment("blocks_loaded_total")
+            logger.debug("Block %s inserted into database.", block.height)
+
+    except Exception as e:
+        logger.error("Error while inserting block into database: %s", e)
+        raise
+
+
+def rebuild_rollups(start_height: int, end_height: int, schema_name: str = DB_NAME) -> None:
+    """
+    Recomputes the hourly, daily and weekly rollups touched by a height range.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        schema_name (str): The name of the database schema to use.
+    """
+    try:
+        with db_cursor(schema_name) as (conn, cursor):
+            rebuild_rollups_for_heights(cursor, start_height, end_height)
 
     except Exception as e:
-        logger.error(f"Error while inserting block into database: {e}")
+        logger.error("Error while rebuilding rollups, rolling back: %s", e)
         raise
 
 
-def insert_transaction(tx: Transaction, schema_name: str = DB_NAME) -> None:
+def _write_witness_archive(
+    cursor: sqlite3.Cursor, height: int, stacks_by_tx: dict[str, list[list[str]]]
+) -> None:
+    execute_insert(
+        cursor,
+        TABLE_WITNESS_ARCHIVE,
+        f"INSERT OR REPLACE INTO {TABLE_WITNESS_ARCHIVE} (height, data) VALUES (?, ?)",
+        (height, pack_witness_stacks(stacks_by_tx)),
+    )
+    logger.debug("Witnesses of %s transactions archived for block %s.", len(stacks_by_tx), height)
+
+
+def archive_witness_stacks(cursor: sqlite3.Cursor, rows: list[tuple]) -> None:
+    """
+    Packs witness stacks into the compressed per block archive, replacing it.
+
+    An archive is written in one piece, so the rows must hold every transaction of their
+    blocks: load whole blocks, or use bulk mode, which stages pages and packs each block once
+    in finish_bulk_load.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        rows (list): (height, tx_id, witness stacks per input) rows,
+            see etl.transform.transaction_to_rows.
+
+    Raises:
+        ValueError: If the rows do not hold all transactions of a loaded block.
+    """
+    stacks_by_height = {}
+    for height, tx_id, stacks in rows:
+        stacks_by_height.setdefault(height, {})[tx_id] = stacks
+
+    for height, stacks_by_tx in stacks_by_height.items():
+        cursor.execute(f"SELECT tx_count FROM {TABLE_BLOCKS} WHERE height = ?", (height,))
+        block = cursor.fetchone()
+        if block is None or len(stacks_by_tx) != block[0]:
+            raise ValueError(
+                f"Witness archive of block {height} needs all its transactions, got "
+                f"{len(stacks_by_tx)} of {block[0] if block else 'an unloaded block'}; "
+                "load whole blocks or use bulk mode."
+            )
+        _write_witness_archive(cursor, height, stacks_by_tx)
+
+
+def pack_staged_witness_archives(cursor: sqlite3.Cursor) -> int:
+    """
+    Packs the witness stacks staged during a bulk load into one archive per block, merged
+    with any archive the block already has, and drops the staging table.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+
+    Returns:
+        int: The number of block archives written.
+    """
+    staging = staging_table(TABLE_WITNESS_ARCHIVE)
+    cursor.execute(f"SELECT DISTINCT height FROM {staging} ORDER BY height")
+    heights = [row[0] for row in cursor.fetchall()]
+    for height in heights:
+        cursor.execute(f"SELECT data FROM {TABLE_WITNESS_ARCHIVE} WHERE height = ?", (height,))
+        existing = cursor.fetchone()
+        stacks_by_tx = WitnessArchive(existing[0]).to_dict() if existing is not None else {}
+        cursor.execute(f"SELECT tx_id, stacks FROM {staging} WHERE height = ?", (height,))
+        stacks_by_tx.update((tx_id, json.loads(stacks)) for tx_id, stacks in cursor.fetchall())
+        _write_witness_archive(cursor, height, stacks_by_tx)
+
+    cursor.execute(f"DROP TABLE {staging}")
+    return len(heights)
+
+
+def insert_transaction_rows(
+    cursor: sqlite3.Cursor, rows: dict[str, list[tuple]], staged: bool = False
+) -> None:
+    """
+    Inserts flattened transaction rows (see etl.transform.transaction_to_rows).
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        rows (dict): Rows keyed by table name.
+        staged (bool): True to insert into the staging tables of a bulk load.
+    """
+    for table_name, columns in TRANSACTION_TABLE_COLUMNS.items():
+        if rows.get(table_name):
+            target = staging_table(table_name) if staged else table_name
+            batch_insert(cursor, target, columns, rows[table_name])
+            logger.debug("%s rows inserted into table '%s'.", len(rows[table_name]), target)
+
+    if rows.get(TABLE_WITNESS_ARCHIVE) and staged:
+        batch_insert(
+            cursor,
+            staging_table(TABLE_WITNESS_ARCHIVE),
+            ["height", "tx_id", "stacks"],
+            [
+                (height, tx_id, json.dumps(stacks))
+                for height, tx_id, stacks in rows[TABLE_WITNESS_ARCHIVE]
+            ],
+        )
+    elif rows.get(TABLE_WITNESS_ARCHIVE):
+        archive_witness_stacks(cursor, rows[TABLE_WITNESS_ARCHIVE])
+
+
+def _stored_tx_index(cursor: sqlite3.Cursor, tx: "Transaction") -> int:
+    """Returns the stored position of a transaction, or the next free one in its block."""
+    cursor.execute(f"SELECT tx_index FROM {TABLE_TRANSACTIONS} WHERE tx_id = ?", (tx.tx_id,))
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    cursor.execute(
+        f"SELECT COALESCE(MAX(tx_index) + 1, 0) FROM {TABLE_TRANSACTIONS} WHERE block_height = ?",
+        (tx.status.block_height,),
+    )
+    return cursor.fetchone()[0]
+
+
+def insert_transaction(
+    tx: "Transaction",
+    schema_name: str = DB_NAME,
+    witness_storage: WitnessStorage = WITNESS_STORAGE,
+    *,
+    tx_index: int | None = None,
+) -> None:
     """
     Insert all details of a transaction into the database.
 
     Parameters:
         tx (Transaction): The transaction to insert.
         schema_name (str): The name of the database schema to use.
+        witness_storage (WitnessStorage): Store witnesses as rows or in the block's archive.
+            The archive is written per block, so with ARCHIVE pass every transaction of the
+            block at once (see archive_witness_stacks) or use bulk mode.
+        tx_index (int | None): The position of the transaction in its block. None keeps the
+            position of a transaction already stored, or appends it to its block, which is
+            only right when the transactions of a block are inserted in block order.
+
+    Raises:
+        ValueError: If witnesses are archived and the block has other transactions.
+    """
+    try:
+        with db_cursor(schema_name) as (conn, cursor):
+            if tx_index is None:
+                tx_index = _stored_tx_index(cursor, tx)
+            insert_transaction_rows(cursor, transaction_to_rows(tx, tx_index, witness_storage))
+            metrics.increment("transactions_loaded_total")
+            logger.debug("Transaction %s inserted into database.", tx.tx_id)
+
+    except Exception as e:
+        logger.error("Error while inserting transaction %s, rolling back: %s", tx.tx_id, e)
+        raise
+
+
+def insert_transactions(
+    txs: "list[Transaction]",
+    schema_name: str = DB_NAME,
+    witness_storage: WitnessStorage = WITNESS_STORAGE,
+    start_index: int = 0,
+) -> None:
+    """
+    Insert all details of several transactions into the database in a single transaction.
+
+    Parameters:
+        txs (list): The transactions to insert, consecutive in their block.
+        schema_name (str): The name of the database schema to use.
+        witness_storage (WitnessStorage): Store witnesses as rows or in the block's archive.
+            The archive is written per block, so with ARCHIVE pass every transaction of the
+            block at once (see archive_witness_stacks) or use bulk mode.
+        start_index (int): The position in the block of the first transaction.
+
+    Raises:
+        ValueError: If witnesses are archived and a block's transactions are incomplete.
+    """
+    rows = {}
+    for tx_index, tx in enumerate(txs, start_index):
+        merge_rows(rows, transaction_to_rows(tx, tx_index, witness_storage))
+    insert_flattened_transactions(rows, schema_name)
+
+
+def insert_flattened_transactions(rows: dict[str, list[tuple]], schema_name: str = DB_NAME) -> None:
+    """
+    Insert transactions already flattened into rows (see etl.transform.transaction_to_rows)
+    into the database in a single transaction.
+
+    Parameters:
+        rows (dict): Rows keyed by table name.
+        schema_name (str): The name of the database schema to use.
+    """
+    tx_count = len(rows.get(TABLE_TRANSACTIONS, []))
+    try:
+        with db_cursor(schema_name) as (conn, cursor):
+            insert_transaction_rows(cursor, rows)
+            metrics.increment("transactions_loaded_total", tx_count)
+            logger.debug("%s transactions inserted into database.", tx_count)
+
+    except Exception as e:
+        logger.error("Error while inserting %s transactions, rolling back: %s", tx_count, e)
+        raise
+
+
+def start_bulk_load(schema_name: str = DB_NAME) -> None:
+    """
+    Prepares the database for a bulk load of transactions.
+
+    In bulk mode transactions are written to unindexed staging tables without foreign key
+    enforcement. Call finish_bulk_load once all transactions are staged.
+
+    Parameters:
+        schema_name (str): The name of the database schema to use.
+    """
+    with db_cursor(schema_name, foreign_keys=False) as (conn, cursor):
+        create_staging_tables(cursor)
+
+
+def stage_transactions(
+    txs: "list[Transaction]",
+    schema_name: str = DB_NAME,
+    witness_storage: WitnessStorage = WITNESS_STORAGE,
+    start_index: int = 0,
+) -> None:
+    """
+    Writes transactions into the staging tables of a bulk load started with start_bulk_load.
+
+    Archived witness stacks are staged per transaction as well and packed into one archive
+    per block by finish_bulk_load, so pages of a block can be staged separately.
+
+    Parameters:
+        txs (list): The transactions to stage, consecutive in their block.
+        schema_name (str): The name of the database schema to use.
+        witness_storage (WitnessStorage): Store witnesses as rows or in the block's archive.
+        start_index (int): The position in the block of the first transaction.
+    """
+    rows = {}
+    for tx_index, tx in enumerate(txs, start_index):
+        merge_rows(rows, transaction_to_rows(tx, tx_index, witness_storage))
+
+    try:
+        with db_cursor(schema_name, foreign_keys=False) as (conn, cursor):
+            insert_transaction_rows(cursor, rows, staged=True)
+            metrics.increment("transactions_loaded_total", len(txs))
+            logger.debug("%s transactions staged for bulk load.", len(txs))
+
+    except Exception as e:
+        logger.error("Error while staging %s transactions, rolling back: %s", len(txs), e)
+        raise
+
+
+def finish_bulk_load(schema_name: str = DB_NAME) -> dict[str, int]:
+    """
+    Merges the staged transactions into their tables in key order, rebuilding their secondary
+    indexes once, packs the staged witness stacks into their block archives and checks the
+    referential integrity of the staged rows in one pass.
+
+    Parameters:
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        dict: The number of staged rows violating a foreign key, keyed by
+            "<table> -> <parent table>". Empty if the loaded data is consistent.
+    """
+    try:
+        with db_cursor(schema_name, foreign_keys=False) as (conn, cursor):
+            # Dropped indexes are restored if the merge fails.
+            cursor.execute("BEGIN")
+            merged = merge_staging_tables(cursor)
+            violations = check_staged_foreign_keys(cursor, [*STAGED_TABLES, TABLE_WITNESS_ARCHIVE])
+            merged[TABLE_WITNESS_ARCHIVE] = pack_staged_witness_archives(cursor)
+            drop_staging_tables(cursor)
+            logger.info("Bulk load finished, merged rows: %s.", merged)
+
+    except Exception as e:
+        logger.error("Error while finishing bulk load, rolling back: %s", e)
+        raise
+
+    for relation, count in violations.items():
+        logger.warning("Bulk load left %s rows violating foreign key %s.", count, relation)
+
+    return violations
+
+
+def insert_mempool_snapshot(
+    mempool: "Mempool",
+    timestamp: int,
+    added: list[str],
+    evicted: list[str],
+    fee_histogram_delta: list[tuple[float, int | None]],
+    is_full: bool,
+    schema_name: str = DB_NAME,
+) -> int:
+    """
+    Inserts a mempool snapshot stored as the delta to the previous snapshot.
+
+    Parameters:
+        mempool (Mempool): The mempool summary of the snapshot.
+        timestamp (int): The time the snapshot was taken (UNIX epoch).
+        added (list): The transaction IDs that entered the mempool since the previous snapshot.
+        evicted (list): The transaction IDs that left the mempool since the previous snapshot.
+        fee_histogram_delta (list): The changed (fee rate, vsize) buckets of the fee histogram,
+            vsize None for a removed bucket (see etl.transform.diff_fee_histogram).
+        is_full (bool): True if the snapshot is not based on a previous one, i.e. "added" holds
+            the whole mempool.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        int: The ID of the inserted snapshot.
     """
     try:
         with db_cursor(schema_name) as (conn, cursor):
             cursor.execute(
                 f"""
-                INSERT OR REPLACE INTO {TABLE_TRANSACTIONS} (
-                    tx_id, block_height, v_size, fee_per_vsize,
-                    effective_fee_per_vsize, version, lock_time, size, weight, fee
+                INSERT INTO {TABLE_MEMPOOL_SNAPSHOTS} (
+                    timestamp, count, v_size, total_fee, is_full
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?)
             """,
-                (
-                    tx.tx_id,
-                    tx.status.block_height,
-                    tx.v_size,
-                    tx.fee_per_vsize,
-                    tx.effective_fee_per_vsize,
-                    tx.version,
-                    tx.lock_time,
-                    tx.size,
-                    tx.weight,
-                    tx.fee,
-                ),
-            )
-            logger.debug(f"Transaction {tx.tx_id} inserted into table '{TABLE_TRANSACTIONS}'.")
-
-            tx_outputs = [
-                (
-                    tx.tx_id,
-                    index,
-                    v_output.script_pubkey,
-                    v_output.script_pubkey_asm,
-                    v_output.script_pubkey_type,
-                    v_output.script_pubkey_address,
-                    v_output.value,
-                )
-                for index, v_output in enumerate(tx.v_out)
-            ]
-
-            batch_insert(
-                cursor,
-                TABLE_TX_OUTPUTS,
-                [
-                    "tx_id",
-                    "v_out_index",
-                    "script_pubkey",
-                    "script_pubkey_asm",
-                    "script_pubkey_type",
-                    "script_pubkey_address",
-                    "value",
-                ],
-                tx_outputs,
-            )
-            logger.debug(
-                f"Outputs for transaction {tx.tx_id} inserted into table '{TABLE_TX_OUTPUTS}'."
+                (timestamp, mempool.count, mempool.v_size, mempool.total_fee, is_full),
             )
-
-            tx_inputs = [
-                (
-                    tx.tx_id,
-                    index,
-                    v_input.prev_tx_id,
-                    v_input.v_out,
-                    v_input.script_sig,
-                    v_input.script_sig_asm,
-                    v_input.is_coinbase,
-                    v_input.sequence,
-                    v_input.inner_redeem_script_asm,
-                    v_input.inner_witness_script_asm,
-                )
-                for index, v_input in enumerate(tx.v_in)
-            ]
+            snapshot_id = cursor.lastrowid
 
             batch_insert(
                 cursor,
-                TABLE_TX_INPUTS,
-                [
-                    "tx_id",
-                    "v_in_index",
-                    "prev_tx_id",
-                    "v_out_index",
-                    "script_sig",
-                    "script_sig_asm",
-                    "is_coinbase",
-                    "sequence",
-                    "inner_redeem_script_asm",
-                    "inner_witness_script_asm",
-                ],
-                tx_inputs,
+                TABLE_MEMPOOL_TX_DELTAS,
+                ["snapshot_id", "tx_id", "added"],
+                [(snapshot_id, tx_id, True) for tx_id in added]
+                + [(snapshot_id, tx_id, False) for tx_id in evicted],
             )
-            logger.debug(
-                f"Inputs for transaction {tx.tx_id} inserted into table '{TABLE_TX_INPUTS}'."
-            )
-
             batch_insert(
                 cursor,
-                TABLE_WITNESSES,
-                ["tx_id", "witness"],
-                [(tx.tx_id, witness) for v_input in tx.v_in for witness in v_input.witness],
+                TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS,
+                ["snapshot_id", "fee_rate", "v_size"],
+                [(snapshot_id, fee_rate, v_size) for fee_rate, v_size in fee_histogram_delta],
             )
-            logger.debug(
-                f"Witness for transaction {tx.tx_id} inserted into table '{TABLE_WITNESSES}'."
+            logger.info(
+                "Mempool snapshot %s inserted into database (+%s/-%s transactions).",
+                snapshot_id,
+                len(added),
+                len(evicted),
             )
-
-            logger.info(f"Transaction {tx.tx_id} inserted into database.")
+            return snapshot_id
 
     except Exception as e:
-        logger.error(f"Error while inserting transaction {tx.tx_id}, rolling back: {e}")
+        logger.error("Error while inserting mempool snapshot, rolling back: %s", e)
         raise
@@ -0,0 +1,77 @@
+import time
+
+from common.config import DB_NAME, MEMPOOL_SNAPSHOT_INTERVAL
+from common.logger import setup_logger
+from etl.extract import get_mempool, get_mempool_transaction_ids
+from etl.load import insert_mempool_snapshot
+from etl.transform import diff_fee_histogram, diff_transaction_ids
+
+logger = setup_logger(__name__)
+
+
+def take_mempool_snapshot(
+    previous_tx_ids: set[str] | None,
+    previous_fee_histogram: list[tuple[float, int]],
+    schema_name: str = DB_NAME,
+) -> tuple[set[str], list[tuple[float, int]]]:
+    """
+    Takes a snapshot of the mempool and stores its delta to the previous snapshot.
+
+    Parameters:
+        previous_tx_ids (set | None): The transaction IDs of the previous snapshot,
+            None to store a full snapshot.
+        previous_fee_histogram (list): The fee histogram of the previous snapshot.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        tuple: The transaction IDs and the fee histogram of the new snapshot,
+            to be passed in as the previous snapshot on the next call.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    timestamp = int(time.time())
+    mempool = get_mempool()
+    tx_ids = set(get_mempool_transaction_ids())
+
+    is_full = previous_tx_ids is None
+    added, evicted = diff_transaction_ids(set() if is_full else previous_tx_ids, tx_ids)
+    fee_histogram_delta = diff_fee_histogram(
+        [] if is_full else previous_fee_histogram, mempool.fee_histogram
+    )
+
+    insert_mempool_snapshot(
+        mempool, timestamp, added, evicted, fee_histogram_delta, is_full, schema_name
+    )
+    return tx_ids, mempool.fee_histogram
+
+
+def follow_mempool(
+    interval: int = MEMPOOL_SNAPSHOT_INTERVAL,
+    snapshots: int | None = None,
+    schema_name: str = DB_NAME,
+) -> None:
+    """
+    Periodically snapshots the mempool, storing only the changes between snapshots.
+
+    The first snapshot of every run is stored in full, so history can be rebuilt
+    from the latest full snapshot onwards (see etl.query.get_mempool_transaction_ids and
+    etl.query.get_mempool_fee_histogram).
+
+    Parameters:
+        interval (int): Seconds between the start of two snapshots.
+        snapshots (int | None): The number of snapshots to take, None to run forever.
+        schema_name (str): The name of the database schema to use.
+    """
+    tx_ids, fee_histogram = None, []
+    taken = 0
+    while snapshots is None or taken < snapshots:
+        started = time.monotonic()
+        try:
+            tx_ids, fee_histogram = take_mempool_snapshot(tx_ids, fee_histogram, schema_name)
+            taken += 1
+        except Exception as e:
+            logger.error("Error while taking mempool snapshot, retrying next interval: %s", e)
+
+        if snapshots is None or taken < snapshots:
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,247 @@
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from common import metrics
+from common.config import DB_NAME, PAGE_FETCH_THREADS, SHARD_SIZE, TXS_PAGE_SIZE
+from common.logger import ProgressLogger, setup_logger
+from db.database import create_tables
+from db.shards import shard_path, shard_ranges
+from etl.extract import (
+    get_all_transactions_from_block,
+    get_block_by_height,
+    get_transactions_batch_raw,
+)
+from etl.load import insert_block, insert_flattened_transactions, insert_transactions
+from etl.transform import decode_transactions_batch, merge_rows
+from util import utils
+
+if TYPE_CHECKING:
+    from model.block import Block
+
+logger = setup_logger(__name__)
+
+
+def load_block(height_of_block: int, schema_name: str = DB_NAME) -> int:
+    """
+    Extracts the block at the given height with all its transactions and loads them.
+
+    Parameters:
+        height_of_block (int): The height of the block.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        int: The number of transactions loaded.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    block = get_block_by_height(height_of_block)
+    transactions = get_all_transactions_from_block(block.id)
+    insert_block(block, schema_name)
+    insert_transactions(transactions, schema_name)
+    return len(transactions)
+
+
+def load_blocks(
+    start_height: int,
+    end_height: int,
+    schema_name: str = DB_NAME,
+    graph_directory: str | None = None,
+    stop: threading.Event | None = None,
+) -> int:
+    """
+    Extracts and loads every block of a height range, in height order.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        schema_name (str): The name of the database schema to use.
+        graph_directory (str | None): If set, the transaction graph export in this directory
+            is extended with the loaded heights (see etl.graph.export_graph).
+        stop (threading.Event | None): Checked between two blocks; once it is set the
+            remaining blocks are skipped, e.g. because the lease on the range was lost.
+
+    Returns:
+        int: The number of transactions loaded.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    logger.info("Loading blocks %s to %s.", start_height, end_height)
+    progress = ProgressLogger(logger)
+    loaded = 0
+    for height in range(start_height, end_height + 1):
+        if stop is not None and stop.is_set():
+            logger.warning("Stopped loading blocks before height %s.", height)
+            return loaded
+        transactions = load_block(height, schema_name)
+        loaded += transactions
+        progress.add(blocks=1, transactions=transactions)
+    progress.log()
+    if graph_directory is not None:
+        # Imported here so that loading without a graph export does not import numpy.
+        from etl.graph import export_graph
+
+        export_graph(graph_directory, schema_name=schema_name)
+    return loaded
+
+
+def _fetch_and_decode(block_id: str, start_index: int, decode_pool: ProcessPoolExecutor) -> Future:
+    page = get_transactions_batch_raw(block_id, start_index)
+    return decode_pool.submit(
+        decode_transactions_batch, page, start_index, decoding=utils.model_decoding
+    )
+
+
+def _submit_block(
+    height_of_block: int, decode_pool: ProcessPoolExecutor, fetch_pool: ThreadPoolExecutor
+) -> tuple["Block", list[Future]]:
+    """Fetches a block and queues the fetching and decoding of its transaction pages."""
+    block = get_block_by_height(height_of_block)
+    pages = [
+        fetch_pool.submit(_fetch_and_decode, block.id, start_index, decode_pool)
+        for start_index in range(0, block.tx_count, TXS_PAGE_SIZE)
+    ]
+    return block, pages
+
+
+def _insert_decoded_block(block: "Block", pages: list[Future], schema_name: str) -> int:
+    """Waits for the decoded pages of a block queued by _submit_block and inserts them."""
+    rows = {}
+    for page in pages:
+        page_rows, validation_seconds = page.result().result()
+        metrics.observe("validation_seconds", validation_seconds, model="Transaction")
+        merge_rows(rows, page_rows)
+
+    insert_block(block, schema_name)
+    insert_flattened_transactions(rows, schema_name)
+    return block.tx_count
+
+
+def load_block_decoded_in_pool(
+    height_of_block: int,
+    decode_pool: ProcessPoolExecutor,
+    fetch_pool: ThreadPoolExecutor,
+    schema_name: str = DB_NAME,
+) -> int:
+    """
+    Like load_block, but decodes and flattens the transaction pages in worker processes.
+
+    Pages are fetched concurrently by fetch_pool and each one is handed to decode_pool as soon
+    as it arrives; only raw bytes go to the workers and only row tuples come back.
+
+    Parameters:
+        height_of_block (int): The height of the block.
+        decode_pool (ProcessPoolExecutor): The worker processes decoding the pages.
+        fetch_pool (ThreadPoolExecutor): The threads fetching the pages.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        int: The number of transactions loaded.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    block, pages = _submit_block(height_of_block, decode_pool, fetch_pool)
+    return _insert_decoded_block(block, pages, schema_name)
+
+
+def load_blocks_parallel(
+    start_height: int,
+    end_height: int,
+    schema_name: str = DB_NAME,
+    workers: int | None = None,
+) -> int:
+    """
+    Extracts and loads every block of a height range, decoding transactions on all cores.
+
+    The pages of the next block are fetched and decoded while the current block is inserted,
+    so the decoding processes are not idle during the SQLite writes.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        schema_name (str): The name of the database schema to use.
+        workers (int | None): The number of decoding processes, defaults to the number of CPUs.
+
+    Returns:
+        int: The number of transactions loaded.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    logger.info("Loading blocks %s to %s with parallel decoding.", start_height, end_height)
+    progress = ProgressLogger(logger)
+    loaded = 0
+    with (
+        ProcessPoolExecutor(max_workers=workers) as decode_pool,
+        ThreadPoolExecutor(max_workers=PAGE_FETCH_THREADS) as fetch_pool,
+    ):
+        pending = None
+        # One height past the range, to insert the last block once nothing is left to queue.
+        for height in range(start_height, end_height + 2):
+            submitted = (
+                _submit_block(height, decode_pool, fetch_pool) if height <= end_height else None
+            )
+            if pending is not None:
+                transactions = _insert_decoded_block(*pending, schema_name)
+                loaded += transactions
+                progress.add(blocks=1, transactions=transactions)
+            pending = submitted
+    progress.log()
+    return loaded
+
+
+def _load_shard(start_height: int, end_height: int, schema_name: str, node_url: str) -> int:
+    utils.set_base_url(node_url)
+    create_tables(schema_name)
+    return load_blocks(start_height, end_height, schema_name)
+
+
+def load_blocks_sharded(
+    start_height: int,
+    end_height: int,
+    directory: str = ".",
+    shard_size: int = SHARD_SIZE,
+    workers: int | None = None,
+) -> int:
+    """
+    Extracts and loads a height range into one SQLite file per shard, shards in parallel.
+
+    Every shard is written by exactly one worker process, so the writers never wait on each
+    other's database lock.
+
+    Parameters:
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+        directory (str): The directory of the shard files.
+        shard_size (int): The number of heights per shard.
+        workers (int | None): The number of worker processes, defaults to one per shard
+            up to the number of CPUs.
+
+    Returns:
+        int: The number of transactions loaded.
+
+    Raises:
+        requests.exceptions.HTTPError: If the HTTP request returns an unsuccessful status code.
+    """
+    ranges = shard_ranges(start_height, end_height, shard_size)
+    workers = workers or min(len(ranges), os.cpu_count() or 1)
+    logger.info(
+        "Loading blocks %s to %s into %s shards with %s workers.",
+        start_height,
+        end_height,
+        len(ranges),
+        workers,
+    )
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _load_shard, start, end, shard_path(start, directory, shard_size), utils.base_url
+            )
+            for start, end in ranges
+        ]
+        return sum(future.result() for future in futures)
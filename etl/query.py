@@ -0,0 +1,210 @@
+from common.config import (
+    ADDRESS_HISTORY_PAGE_SIZE,
+    DB_NAME,
+    TABLE_ADDRESS_POSTINGS,
+    TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS,
+    TABLE_MEMPOOL_SNAPSHOTS,
+    TABLE_MEMPOOL_TX_DELTAS,
+    TABLE_TRANSACTIONS,
+    TABLE_WITNESS_ARCHIVE,
+)
+from common.logger import setup_logger
+from etl.load import db_cursor
+from etl.transform import WitnessArchive
+from model.address import AddressPosting
+
+logger = setup_logger(__name__)
+
+
+def get_address_history(
+    address: str,
+    after: AddressPosting | None = None,
+    page_size: int = ADDRESS_HISTORY_PAGE_SIZE,
+    schema_name: str = DB_NAME,
+) -> list[AddressPosting]:
+    """
+    Returns the transaction history of an address in block order, with its running balance.
+
+    Pages are addressed by the last posting of the previous page, whose position is the key
+    the next page starts after and whose balance the running balance continues from, so every
+    page costs the same however deep into the history it is.
+
+    Parameters:
+        address (str): The address.
+        after (AddressPosting | None): The last posting of the previous page, None for the
+            first page.
+        page_size (int): The number of postings per page.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        list: The postings of the requested page, oldest first.
+    """
+    height, tx_index, balance = -1, -1, 0
+    if after is not None:
+        height, tx_index, balance = after.height, after.tx_index, after.balance
+    logger.debug("Getting history of address %s after %s/%s.", address, height, tx_index)
+    with db_cursor(schema_name) as (conn, cursor):
+        cursor.execute(
+            f"""
+            SELECT height, tx_index, tx_id, delta
+            FROM {TABLE_ADDRESS_POSTINGS}
+            WHERE address = ? AND (height, tx_index) > (?, ?)
+            ORDER BY height, tx_index
+            LIMIT ?
+        """,
+            (address, height, tx_index, page_size),
+        )
+        postings = []
+        for height, tx_index, tx_id, delta in cursor.fetchall():
+            balance += delta
+            postings.append(
+                AddressPosting(
+                    height=height, tx_index=tx_index, tx_id=tx_id, delta=delta, balance=balance
+                )
+            )
+        return postings
+
+
+def get_address_balance(address: str, schema_name: str = DB_NAME) -> int:
+    """
+    Returns the current balance of an address.
+
+    Parameters:
+        address (str): The address.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        int: The balance in satoshis, 0 for unknown addresses.
+    """
+    with db_cursor(schema_name) as (conn, cursor):
+        cursor.execute(
+            f"SELECT COALESCE(SUM(delta), 0) FROM {TABLE_ADDRESS_POSTINGS} WHERE address = ?",
+            (address,),
+        )
+        return cursor.fetchone()[0]
+
+
+def _full_snapshot_id(cursor, snapshot_id: int) -> int | None:
+    """Returns the ID of the latest full mempool snapshot at or before the given one."""
+    cursor.execute(
+        f"SELECT MAX(id) FROM {TABLE_MEMPOOL_SNAPSHOTS} WHERE is_full AND id <= ?",
+        (snapshot_id,),
+    )
+    return cursor.fetchone()[0]
+
+
+def get_mempool_transaction_ids(snapshot_id: int, schema_name: str = DB_NAME) -> set[str]:
+    """
+    Rebuilds the set of transaction IDs in the mempool at the given snapshot.
+
+    Replays the deltas from the latest full snapshot at or before the given one.
+
+    Parameters:
+        snapshot_id (int): The ID of the snapshot.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        set: The transaction IDs in the mempool, empty if no full snapshot precedes it.
+    """
+    with db_cursor(schema_name) as (conn, cursor):
+        full_snapshot_id = _full_snapshot_id(cursor, snapshot_id)
+        if full_snapshot_id is None:
+            return set()
+
+        tx_ids = set()
+        cursor.execute(
+            f"""
+            SELECT tx_id, added FROM {TABLE_MEMPOOL_TX_DELTAS}
+            WHERE snapshot_id BETWEEN ? AND ?
+            ORDER BY snapshot_id
+        """,
+            (full_snapshot_id, snapshot_id),
+        )
+        for tx_id, added in cursor:
+            if added:
+                tx_ids.add(tx_id)
+            else:
+                tx_ids.discard(tx_id)
+        return tx_ids
+
+
+def get_mempool_fee_histogram(
+    snapshot_id: int, schema_name: str = DB_NAME
+) -> list[tuple[float, int]]:
+    """
+    Rebuilds the fee histogram of the mempool at the given snapshot.
+
+    Replays the deltas from the latest full snapshot at or before the given one, a bucket
+    stored without vsize was removed.
+
+    Parameters:
+        snapshot_id (int): The ID of the snapshot.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        list: The (fee rate, vsize) buckets from the highest fee rate down, as reported by the
+            node, empty if no full snapshot precedes it.
+    """
+    with db_cursor(schema_name) as (conn, cursor):
+        full_snapshot_id = _full_snapshot_id(cursor, snapshot_id)
+        if full_snapshot_id is None:
+            return []
+
+        buckets = {}
+        cursor.execute(
+            f"""
+            SELECT fee_rate, v_size FROM {TABLE_MEMPOOL_FEE_HISTOGRAM_DELTAS}
+            WHERE snapshot_id BETWEEN ? AND ?
+            ORDER BY snapshot_id
+        """,
+            (full_snapshot_id, snapshot_id),
+        )
+        for fee_rate, v_size in cursor:
+            if v_size is not None:
+                buckets[fee_rate] = v_size
+            else:
+                buckets.pop(fee_rate, None)
+        return sorted(buckets.items(), reverse=True)
+
+
+def get_block_witnesses(height_of_block: int, schema_name: str = DB_NAME) -> WitnessArchive | None:
+    """
+    Returns the lazily decoded witness archive of a block.
+
+    Parameters:
+        height_of_block (int): The height of the block.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        WitnessArchive | None: The archive, None if the block has none.
+    """
+    with db_cursor(schema_name) as (conn, cursor):
+        cursor.execute(
+            f"SELECT data FROM {TABLE_WITNESS_ARCHIVE} WHERE height = ?", (height_of_block,)
+        )
+        row = cursor.fetchone()
+        return WitnessArchive(row[0]) if row is not None else None
+
+
+def get_witness_stacks(tx_id: str, schema_name: str = DB_NAME) -> list[list[str]] | None:
+    """
+    Returns the archived witness stacks of a transaction, one list of hex items per input.
+
+    Parameters:
+        tx_id (str): The ID of the transaction.
+        schema_name (str): The name of the database schema to use.
+
+    Returns:
+        list | None: The witness stacks in input order, None if the transaction is not archived.
+    """
+    with db_cursor(schema_name) as (conn, cursor):
+        cursor.execute(
+            f"""
+            SELECT a.data FROM {TABLE_TRANSACTIONS} t
+            JOIN {TABLE_WITNESS_ARCHIVE} a ON a.height = t.block_height
+            WHERE t.tx_id = ?
+        """,
+            (tx_id,),
+        )
+        row = cursor.fetchone()
+        return WitnessArchive(row[0]).get(tx_id) if row is not None else None
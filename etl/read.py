@@ -0,0 +1,400 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from common.config import (
+    DB_NAME,
+    READ_CACHE_CONFIRMATIONS,
+    READ_CACHE_SIZE,
+    TABLE_BLOCKS,
+    TABLE_COINBASE_ADDRESSES,
+    TABLE_EXTRAS,
+    TABLE_FEE_RANGE,
+    TABLE_MINERS,
+    TABLE_POOLS,
+    TABLE_TRANSACTIONS,
+    TABLE_TX_INPUTS,
+    TABLE_TX_OUTPUTS,
+    TABLE_WITNESS_ARCHIVE,
+    TABLE_WITNESSES,
+)
+from common.logger import setup_logger
+from etl import extract
+from etl.load import db_cursor
+from etl.transform import WitnessArchive
+from model.block import Block, Extras, Pool
+from model.transaction import Status, Transaction, TxInput, TxOutput
+
+logger = setup_logger(__name__)
+
+_BLOCK_FIELDS = [
+    "id",
+    "height",
+    "version",
+    "timestamp",
+    "bits",
+    "nonce",
+    "difficulty",
+    "merkle_root",
+    "tx_count",
+    "size",
+    "weight",
+    "previous_block_hash",
+    "median_time",
+]
+_EXTRAS_FIELDS = [
+    "header",
+    "reward",
+    "median_fee",
+    "total_fees",
+    "avg_fee",
+    "avg_fee_rate",
+    "coinbase_raw",
+    "coinbase_address",
+    "coinbase_signature",
+    "utxo_set_change",
+    "avg_tx_size",
+    "total_inputs",
+    "total_outputs",
+    "total_output_amt",
+    "segwit_total_txs",
+    "segwit_total_size",
+    "segwit_total_weight",
+    "virtual_size",
+    "similarity",
+]
+_OUTPUT_FIELDS = [
+    "script_pubkey",
+    "script_pubkey_asm",
+    "script_pubkey_type",
+    "script_pubkey_address",
+    "value",
+]
+_INPUT_FIELDS = [
+    "prev_tx_id",
+    "v_out",
+    "script_sig",
+    "script_sig_asm",
+    "is_coinbase",
+    "sequence",
+    "inner_redeem_script_asm",
+    "inner_witness_script_asm",
+]
+_TRANSACTION_FIELDS = [
+    "v_size",
+    "fee_per_vsize",
+    "effective_fee_per_vsize",
+    "version",
+    "lock_time",
+    "size",
+    "weight",
+    "fee",
+]
+
+# LRU cache of blocks and transactions at least READ_CACHE_CONFIRMATIONS below the local tip.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key: tuple):
+    with _cache_lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+        return value
+
+
+def _cache_put(key: tuple, value, height: int, tip_height: int | None) -> None:
+    if tip_height is None or height > tip_height - READ_CACHE_CONFIRMATIONS:
+        return
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > READ_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_cache() -> None:
+    """Empties the cache of deeply confirmed blocks and transactions."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _tip_height(cursor: sqlite3.Cursor) -> int | None:
+    cursor.execute(f"SELECT MAX(height) FROM {TABLE_BLOCKS}")
+    return cursor.fetchone()[0]
+
+
+def _read_block(cursor: sqlite3.Cursor, height_of_block: int) -> Block | None:
+    cursor.execute(
+        f"""
+        SELECT b.id, b.height, b.version, b.timestamp, b.bits, b.nonce, b.difficulty,
+            b.merkle_root, b.tx_count, b.size, b.weight, b.previous_block_hash, b.median_time,
+            e.header, e.reward, e.median_fee, e.total_fees, e.avg_fee, e.avg_fee_rate,
+            e.coinbase_raw, e.coinbase_address, e.coinbase_signature, e.utxo_set_change,
+            e.avg_tx_size, e.total_inputs, e.total_outputs, e.total_output_amt,
+            e.segwit_total_txs, e.segwit_total_size, e.segwit_total_weight, e.virtual_size,
+            e.similarity, p.id, p.name, p.slug,
+            (SELECT json_group_array(fee) FROM
+                (SELECT fee FROM {TABLE_FEE_RANGE} WHERE height = b.height ORDER BY id)),
+            (SELECT json_group_array(address) FROM
+                (SELECT address FROM {TABLE_COINBASE_ADDRESSES} WHERE height = b.height
+                    ORDER BY id)),
+            (SELECT json_group_array(name) FROM
+                (SELECT name FROM {TABLE_MINERS} WHERE height = b.height ORDER BY id))
+        FROM {TABLE_BLOCKS} b
+        JOIN {TABLE_EXTRAS} e ON e.height = b.height
+        JOIN {TABLE_POOLS} p ON p.height = b.height
+        WHERE b.height = ?
+    """,
+        (height_of_block,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    miner_names = json.loads(row[37])
+    return Block(
+        **dict(zip(_BLOCK_FIELDS, row[:13])),
+        extras=Extras(
+            **dict(zip(_EXTRAS_FIELDS, row[13:32])),
+            fee_range=json.loads(row[35]),
+            coinbase_addresses=json.loads(row[36]),
+            pool=Pool(id=row[32], name=row[33], slug=row[34], miner_names=miner_names or None),
+        ),
+    )
+
+
+def _read_transactions(
+    cursor: sqlite3.Cursor, condition: str, parameters: tuple
+) -> tuple[list[Transaction], bool]:
+    """
+    Rebuilds the transactions matching a condition on `t`, the transactions table.
+
+    Five queries are issued whatever the number of transactions, inputs and outputs, each
+    starting from the matching transactions through an index.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        condition (str): SQL condition on the transactions table aliased `t`.
+        parameters (tuple): The parameters of the condition.
+
+    Returns:
+        tuple: The transactions in block order, and whether they were rebuilt exactly. They are
+            not when an input spends a transaction that is not loaded, as its prev_out is lost.
+    """
+    cursor.execute(
+        f"""
+        SELECT t.tx_id, t.v_size, t.fee_per_vsize, t.effective_fee_per_vsize, t.version,
+            t.lock_time, t.size, t.weight, t.fee, t.block_height, b.id, b.timestamp
+        FROM {TABLE_TRANSACTIONS} t
+        JOIN {TABLE_BLOCKS} b ON b.height = t.block_height
+        WHERE {condition}
+        ORDER BY t.block_height, t.tx_index
+    """,
+        parameters,
+    )
+    transaction_rows = cursor.fetchall()
+    if not transaction_rows:
+        return [], True
+
+    matching_tx_ids = f"SELECT t.tx_id FROM {TABLE_TRANSACTIONS} t WHERE {condition}"
+
+    outputs = {}
+    cursor.execute(
+        f"""
+        SELECT tx_id, script_pubkey, script_pubkey_asm, script_pubkey_type,
+            script_pubkey_address, value
+        FROM {TABLE_TX_OUTPUTS}
+        WHERE tx_id IN ({matching_tx_ids})
+        ORDER BY tx_id, v_out_index
+    """,
+        parameters,
+    )
+    for tx_id, *columns in cursor:
+        outputs.setdefault(tx_id, []).append(TxOutput(**dict(zip(_OUTPUT_FIELDS, columns))))
+
+    inputs = {}
+    exact = True
+    cursor.execute(
+        f"""
+        SELECT i.tx_id, i.prev_tx_id, i.v_out_index, i.script_sig, i.script_sig_asm,
+            i.is_coinbase, i.sequence, i.inner_redeem_script_asm, i.inner_witness_script_asm,
+            p.script_pubkey, p.script_pubkey_asm, p.script_pubkey_type,
+            p.script_pubkey_address, p.value
+        FROM {TABLE_TX_INPUTS} i
+        LEFT JOIN {TABLE_TX_OUTPUTS} p
+            ON p.tx_id = i.prev_tx_id AND p.v_out_index = i.v_out_index
+        WHERE i.tx_id IN ({matching_tx_ids})
+        ORDER BY i.tx_id, i.v_in_index
+    """,
+        parameters,
+    )
+    for tx_id, *columns in cursor:
+        prev_out = None
+        if columns[8] is not None:
+            prev_out = TxOutput(**dict(zip(_OUTPUT_FIELDS, columns[8:])))
+        elif not columns[4]:
+            exact = False
+        inputs.setdefault(tx_id, []).append(
+            dict(zip(_INPUT_FIELDS, columns[:8]), prev_out=prev_out, witness=[])
+        )
+
+    cursor.execute(
+        f"""
+        SELECT height, data FROM {TABLE_WITNESS_ARCHIVE}
+        WHERE height IN (SELECT t.block_height FROM {TABLE_TRANSACTIONS} t WHERE {condition})
+    """,
+        parameters,
+    )
+    archives = {height: WitnessArchive(data) for height, data in cursor.fetchall()}
+    cursor.execute(
+        f"""
+        SELECT tx_id, v_in_index, witness FROM {TABLE_WITNESSES}
+        WHERE tx_id IN ({matching_tx_ids})
+        ORDER BY tx_id, v_in_index, item_index
+    """,
+        parameters,
+    )
+    for tx_id, v_in_index, witness in cursor:
+        inputs[tx_id][v_in_index]["witness"].append(witness)
+
+    transactions = []
+    for tx_id, *columns, block_height, block_hash, block_time in transaction_rows:
+        tx_inputs = inputs.get(tx_id, [])
+        archive = archives.get(block_height)
+        stacks = archive.get(tx_id) if archive is not None else None
+        for v_input, stack in zip(tx_inputs, stacks or []):
+            v_input["witness"] = stack
+        transactions.append(
+            Transaction(
+                tx_id=tx_id,
+                **dict(zip(_TRANSACTION_FIELDS, columns)),
+                v_in=[TxInput(**v_input) for v_input in tx_inputs],
+                v_out=outputs.get(tx_id, []),
+                status=Status(
+                    confirmed=True,
+                    block_height=block_height,
+                    block_hash=block_hash,
+                    block_time=block_time,
+                ),
+            )
+        )
+    return transactions, exact
+
+
+def get_block(
+    height_of_block: int, schema_name: str = DB_NAME, fallback: bool = True
+) -> Block | None:
+    """
+    Returns the block at the given height with its extras and pool.
+
+    Parameters:
+        height_of_block (int): The height of the block.
+        schema_name (str): The name of the database schema to use.
+        fallback (bool): Whether to fetch the block through etl.extract if it is not loaded.
+
+    Returns:
+        Block | None: The block, None if it is not loaded and fallback is disabled.
+
+    Raises:
+        requests.exceptions.HTTPError: If the fallback HTTP request is unsuccessful.
+    """
+    key = ("block", schema_name, height_of_block)
+    block = _cache_get(key)
+    if block is not None:
+        return block
+
+    with db_cursor(schema_name) as (conn, cursor):
+        block = _read_block(cursor, height_of_block)
+        tip_height = _tip_height(cursor)
+    if block is None and fallback:
+        logger.debug("Block %s is not loaded, fetching it.", height_of_block)
+        block = extract.get_block_by_height(height_of_block)
+    if block is not None:
+        _cache_put(key, block, height_of_block, tip_height)
+    return block
+
+
+def get_block_transactions(
+    height_of_block: int, schema_name: str = DB_NAME, fallback: bool = True
+) -> list[Transaction] | None:
+    """
+    Returns all transactions of the block at the given height with their inputs and outputs.
+
+    The transactions are only rebuilt locally when the block is loaded completely, including
+    the transactions its inputs spend, as prev_out would be lost otherwise.
+
+    Parameters:
+        height_of_block (int): The height of the block.
+        schema_name (str): The name of the database schema to use.
+        fallback (bool): Whether to fetch the transactions through etl.extract if they cannot
+            be rebuilt locally.
+
+    Returns:
+        list | None: The transactions in block order, None if they cannot be rebuilt locally
+            and fallback is disabled.
+
+    Raises:
+        requests.exceptions.HTTPError: If the fallback HTTP request is unsuccessful.
+    """
+    key = ("transactions", schema_name, height_of_block)
+    transactions = _cache_get(key)
+    if transactions is not None:
+        return transactions
+
+    with db_cursor(schema_name) as (conn, cursor):
+        transactions, exact = _read_transactions(cursor, "t.block_height = ?", (height_of_block,))
+        block = _read_block(cursor, height_of_block)
+        tip_height = _tip_height(cursor)
+    if block is None or len(transactions) != block.tx_count or not exact:
+        if not fallback:
+            return None
+        logger.debug("Block %s cannot be rebuilt locally, fetching it.", height_of_block)
+        block_hash = (
+            block.id if block is not None else extract.get_block_hash_by_height(height_of_block)
+        )
+        transactions = extract.get_all_transactions_from_block(block_hash)
+    _cache_put(key, transactions, height_of_block, tip_height)
+    return transactions
+
+
+def get_transaction(
+    tx_id: str, schema_name: str = DB_NAME, fallback: bool = True
+) -> Transaction | None:
+    """
+    Returns the transaction with the given ID with its inputs and outputs.
+
+    The transaction is only rebuilt locally when the transactions its inputs spend are loaded
+    as well, as prev_out would be lost otherwise.
+
+    Parameters:
+        tx_id (str): The ID of the transaction.
+        schema_name (str): The name of the database schema to use.
+        fallback (bool): Whether to fetch the transaction through etl.extract if it cannot be
+            rebuilt locally.
+
+    Returns:
+        Transaction | None: The transaction, None if it cannot be rebuilt locally and fallback
+            is disabled.
+
+    Raises:
+        requests.exceptions.HTTPError: If the fallback HTTP request is unsuccessful.
+    """
+    key = ("transaction", schema_name, tx_id)
+    transaction = _cache_get(key)
+    if transaction is not None:
+        return transaction
+
+    with db_cursor(schema_name) as (conn, cursor):
+        transactions, exact = _read_transactions(cursor, "t.tx_id = ?", (tx_id,))
+        tip_height = _tip_height(cursor)
+    if not transactions or not exact:
+        if not fallback:
+            return None
+        logger.debug("Transaction %s cannot be rebuilt locally, fetching it.", tx_id)
+        transactions = [extract.get_transaction(tx_id)]
+    transaction = transactions[0]
+    _cache_put(key, transaction, transaction.status.block_height, tip_height)
+    return transaction
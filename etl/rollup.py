@@ -0,0 +1,304 @@
+import sqlite3
+from statistics import median
+
+from common.config import (
+    TABLE_BLOCK_ROLLUPS,
+    TABLE_BLOCKS,
+    TABLE_EXTRAS,
+    TABLE_POOL_ROLLUPS,
+    TABLE_POOLS,
+    RollupBucket,
+)
+from common.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+BUCKET_SECONDS = {
+    RollupBucket.HOURLY: 3600,
+    RollupBucket.DAILY: 86400,
+    RollupBucket.WEEKLY: 7 * 86400,
+}
+
+# The UNIX epoch is a Thursday, weekly buckets start on Mondays (1970-01-05).
+BUCKET_OFFSETS = {
+    RollupBucket.HOURLY: 0,
+    RollupBucket.DAILY: 0,
+    RollupBucket.WEEKLY: 4 * 86400,
+}
+
+
+def bucket_start(timestamp: int, bucket: RollupBucket) -> int:
+    """Returns the start (UNIX epoch) of the bucket containing the timestamp."""
+    return timestamp - (timestamp - BUCKET_OFFSETS[bucket]) % BUCKET_SECONDS[bucket]
+
+
+def refresh_bucket(cursor: sqlite3.Cursor, bucket: RollupBucket, start: int) -> None:
+    """
+    Recomputes the rollup rows of one bucket from the blocks, extras and pools tables.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        bucket (RollupBucket): The bucket size.
+        start (int): The start of the bucket (UNIX epoch), as returned by bucket_start.
+    """
+    end = start + BUCKET_SECONDS[bucket]
+    cursor.execute(
+        f"""
+        SELECT MIN(b.height), MAX(b.height), COUNT(*), SUM(b.tx_count), SUM(e.total_fees),
+            SUM(b.weight), AVG(b.difficulty)
+        FROM {TABLE_BLOCKS} b JOIN {TABLE_EXTRAS} e ON e.height = b.height
+        WHERE b.timestamp >= ? AND b.timestamp < ?
+    """,
+        (start, end),
+    )
+    min_height, max_height, block_count, tx_count, total_fees, total_weight, avg_difficulty = (
+        cursor.fetchone()
+    )
+
+    cursor.execute(
+        f"DELETE FROM {TABLE_POOL_ROLLUPS} WHERE bucket = ? AND bucket_start = ?",
+        (bucket.value, start),
+    )
+    if block_count == 0:
+        cursor.execute(
+            f"DELETE FROM {TABLE_BLOCK_ROLLUPS} WHERE bucket = ? AND bucket_start = ?",
+            (bucket.value, start),
+        )
+        return
+
+    cursor.execute(
+        f"""
+        SELECT e.median_fee
+        FROM {TABLE_BLOCKS} b JOIN {TABLE_EXTRAS} e ON e.height = b.height
+        WHERE b.timestamp >= ? AND b.timestamp < ?
+    """,
+        (start, end),
+    )
+    median_fee = median(row[0] for row in cursor.fetchall())
+
+    cursor.execute(
+        f"""
+        INSERT OR REPLACE INTO {TABLE_BLOCK_ROLLUPS} (
+            bucket, bucket_start, min_height, max_height, block_count, tx_count, total_fees,
+            total_weight, avg_difficulty, median_fee
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        (
+            bucket.value,
+            start,
+            min_height,
+            max_height,
+            block_count,
+            tx_count,
+            total_fees,
+            total_weight,
+            avg_difficulty,
+            median_fee,
+        ),
+    )
+
+    cursor.execute(
+        f"""
+        INSERT INTO {TABLE_POOL_ROLLUPS} (
+            bucket, bucket_start, pool_id, pool_name, block_count, share
+        )
+        SELECT ?, ?, p.id, MAX(p.name), COUNT(*), COUNT(*) * 1.0 / ?
+        FROM {TABLE_BLOCKS} b JOIN {TABLE_POOLS} p ON p.height = b.height
+        WHERE b.timestamp >= ? AND b.timestamp < ?
+        GROUP BY p.id
+    """,
+        (bucket.value, start, block_count, start, end),
+    )
+
+
+def _block_contribution(cursor: sqlite3.Cursor, height: int) -> tuple | None:
+    cursor.execute(
+        f"""
+        SELECT b.timestamp, b.tx_count, e.total_fees, b.weight, b.difficulty, p.id, p.name
+        FROM {TABLE_BLOCKS} b JOIN {TABLE_EXTRAS} e ON e.height = b.height
+        LEFT JOIN {TABLE_POOLS} p ON p.height = b.height
+        WHERE b.height = ?
+    """,
+        (height,),
+    )
+    return cursor.fetchone()
+
+
+def _refresh_order_statistics(
+    cursor: sqlite3.Cursor, bucket: RollupBucket, start: int, excluded_height: int | None = None
+) -> None:
+    # The height range and median fee are the only aggregates that cannot be updated by delta.
+    cursor.execute(
+        f"""
+        SELECT b.height, e.median_fee
+        FROM {TABLE_BLOCKS} b JOIN {TABLE_EXTRAS} e ON e.height = b.height
+        WHERE b.timestamp >= ? AND b.timestamp < ? AND b.height IS NOT ?
+    """,
+        (start, start + BUCKET_SECONDS[bucket], excluded_height),
+    )
+    heights, median_fees = zip(*cursor.fetchall())
+    cursor.execute(
+        f"""
+        UPDATE {TABLE_BLOCK_ROLLUPS} SET min_height = ?, max_height = ?, median_fee = ?
+        WHERE bucket = ? AND bucket_start = ?
+    """,
+        (min(heights), max(heights), median(median_fees), bucket.value, start),
+    )
+
+
+def _refresh_pool_shares(cursor: sqlite3.Cursor, bucket: RollupBucket, start: int) -> None:
+    cursor.execute(
+        f"""
+        UPDATE {TABLE_POOL_ROLLUPS}
+        SET share = block_count * 1.0 / (
+            SELECT block_count FROM {TABLE_BLOCK_ROLLUPS} WHERE bucket = ? AND bucket_start = ?
+        )
+        WHERE bucket = ? AND bucket_start = ?
+    """,
+        (bucket.value, start, bucket.value, start),
+    )
+
+
+def add_block_to_rollups(cursor: sqlite3.Cursor, height: int) -> None:
+    """
+    Adds a loaded block to the rollup rows of every bucket containing it.
+
+    Counts and sums are updated in place, so the cost does not grow with the number of blocks
+    in a bucket, except for the median fee which has to be picked from all of them.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        height (int): The height of the block, already inserted with its extras and pool.
+    """
+    contribution = _block_contribution(cursor, height)
+    if contribution is None:
+        return
+    timestamp, tx_count, total_fees, weight, difficulty, pool_id, pool_name = contribution
+
+    for bucket in RollupBucket:
+        start = bucket_start(timestamp, bucket)
+        cursor.execute(
+            f"""
+            INSERT INTO {TABLE_BLOCK_ROLLUPS} (
+                bucket, bucket_start, min_height, max_height, block_count, tx_count,
+                total_fees, total_weight, avg_difficulty, median_fee
+            )
+            VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, 0)
+            ON CONFLICT (bucket, bucket_start) DO UPDATE SET
+                block_count = block_count + 1,
+                tx_count = tx_count + excluded.tx_count,
+                total_fees = total_fees + excluded.total_fees,
+                total_weight = total_weight + excluded.total_weight,
+                avg_difficulty = (avg_difficulty * block_count + excluded.avg_difficulty)
+                    / (block_count + 1)
+        """,
+            (bucket.value, start, height, height, tx_count, total_fees, weight, difficulty),
+        )
+        _refresh_order_statistics(cursor, bucket, start)
+
+        if pool_id is not None:
+            cursor.execute(
+                f"""
+                INSERT INTO {TABLE_POOL_ROLLUPS} (
+                    bucket, bucket_start, pool_id, pool_name, block_count, share
+                )
+                VALUES (?, ?, ?, ?, 1, 0)
+                ON CONFLICT (bucket, bucket_start, pool_id) DO UPDATE SET
+                    block_count = block_count + 1, pool_name = excluded.pool_name
+            """,
+                (bucket.value, start, pool_id, pool_name),
+            )
+        _refresh_pool_shares(cursor, bucket, start)
+
+
+def remove_block_from_rollups(cursor: sqlite3.Cursor, height: int) -> None:
+    """
+    Takes a block out of the rollup rows of every bucket containing it, the inverse of
+    add_block_to_rollups. Call it before the block is replaced, e.g. with another timestamp,
+    while its old rows are still in place.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        height (int): The height of the block.
+    """
+    contribution = _block_contribution(cursor, height)
+    if contribution is None:
+        return
+    timestamp, tx_count, total_fees, weight, difficulty, pool_id, _ = contribution
+
+    for bucket in RollupBucket:
+        start = bucket_start(timestamp, bucket)
+        cursor.execute(
+            f"""
+            UPDATE {TABLE_BLOCK_ROLLUPS} SET
+                block_count = block_count - 1,
+                tx_count = tx_count - ?,
+                total_fees = total_fees - ?,
+                total_weight = total_weight - ?,
+                avg_difficulty = CASE WHEN block_count > 1
+                    THEN (avg_difficulty * block_count - ?) / (block_count - 1) ELSE 0 END
+            WHERE bucket = ? AND bucket_start = ?
+            RETURNING block_count
+        """,
+            (tx_count, total_fees, weight, difficulty, bucket.value, start),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            # Loaded before the rollup tables existed, see rebuild_rollups_for_heights.
+            continue
+        if row[0] == 0:
+            for table_name in (TABLE_BLOCK_ROLLUPS, TABLE_POOL_ROLLUPS):
+                cursor.execute(
+                    f"DELETE FROM {table_name} WHERE bucket = ? AND bucket_start = ?",
+                    (bucket.value, start),
+                )
+            continue
+        _refresh_order_statistics(cursor, bucket, start, excluded_height=height)
+
+        if pool_id is not None:
+            cursor.execute(
+                f"""
+                UPDATE {TABLE_POOL_ROLLUPS} SET block_count = block_count - 1
+                WHERE bucket = ? AND bucket_start = ? AND pool_id = ?
+            """,
+                (bucket.value, start, pool_id),
+            )
+            cursor.execute(
+                f"""
+                DELETE FROM {TABLE_POOL_ROLLUPS}
+                WHERE bucket = ? AND bucket_start = ? AND block_count <= 0
+            """,
+                (bucket.value, start),
+            )
+        _refresh_pool_shares(cursor, bucket, start)
+
+
+def rebuild_rollups_for_heights(cursor: sqlite3.Cursor, start_height: int, end_height: int) -> int:
+    """
+    Recomputes every rollup bucket touched by the blocks in the height range.
+
+    Parameters:
+        cursor (sqlite3.Cursor): The cursor to use.
+        start_height (int): The first height of the range.
+        end_height (int): The last height of the range (inclusive).
+
+    Returns:
+        int: The number of buckets refreshed.
+    """
+    cursor.execute(
+        f"SELECT DISTINCT timestamp FROM {TABLE_BLOCKS} WHERE height BETWEEN ? AND ?",
+        (start_height, end_height),
+    )
+    timestamps = [row[0] for row in cursor.fetchall()]
+
+    refreshed = 0
+    for bucket in RollupBucket:
+        for start in sorted({bucket_start(timestamp, bucket) for timestamp in timestamps}):
+            refresh_bucket(cursor, bucket, start)
+            refreshed += 1
+
+    logger.info(
+        "Refreshed %s rollup buckets for heights %s to %s.", refreshed, start_height, end_height
+    )
+    return refreshed
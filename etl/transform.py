@@ -0,0 +1,347 @@
+import time
+import zlib
+from typing import TYPE_CHECKING
+
+from common.config import (
+    TABLE_ADDRESS_POSTINGS,
+    TABLE_TRANSACTIONS,
+    TABLE_TX_INPUTS,
+    TABLE_TX_OUTPUTS,
+    TABLE_WITNESS_ARCHIVE,
+    TABLE_WITNESSES,
+    WITNESS_COMPRESSION_LEVEL,
+    WITNESS_STORAGE,
+    ModelDecoding,
+    WitnessStorage,
+)
+from util.utils import decode_models
+
+if TYPE_CHECKING:
+    from model.transaction import Transaction
+
+TRANSACTION_TABLE_COLUMNS = {
+    TABLE_TRANSACTIONS: [
+        "tx_id",
+        "block_height",
+        "tx_index",
+        "v_size",
+        "fee_per_vsize",
+        "effective_fee_per_vsize",
+        "version",
+        "lock_time",
+        "size",
+        "weight",
+        "fee",
+    ],
+    TABLE_TX_OUTPUTS: [
+        "tx_id",
+        "v_out_index",
+        "script_pubkey",
+        "script_pubkey_asm",
+        "script_pubkey_type",
+        "script_pubkey_address",
+        "value",
+    ],
+    TABLE_TX_INPUTS: [
+        "tx_id",
+        "v_in_index",
+        "prev_tx_id",
+        "v_out_index",
+        "script_sig",
+        "script_sig_asm",
+        "is_coinbase",
+        "sequence",
+        "inner_redeem_script_asm",
+        "inner_witness_script_asm",
+    ],
+    TABLE_WITNESSES: ["tx_id", "v_in_index", "item_index", "witness"],
+    TABLE_ADDRESS_POSTINGS: ["address", "height", "tx_index", "tx_id", "delta"],
+}
+
+
+def address_deltas(tx: "Transaction") -> dict[str, int]:
+    """
+    Returns the net balance change of every address touched by the transaction.
+
+    Outputs credit their address, inputs debit the address of the output they spend.
+
+    Parameters:
+        tx (Transaction): The transaction.
+
+    Returns:
+        dict: The net change in satoshis keyed by address.
+    """
+    deltas = {}
+    for v_output in tx.v_out:
+        if v_output.script_pubkey_address:
+            address = v_output.script_pubkey_address
+            deltas[address] = deltas.get(address, 0) + v_output.value
+    for v_input in tx.v_in:
+        if v_input.prev_out is not None and v_input.prev_out.script_pubkey_address:
+            address = v_input.prev_out.script_pubkey_address
+            deltas[address] = deltas.get(address, 0) - v_input.prev_out.value
+    return deltas
+
+
+def transaction_to_rows(
+    tx: "Transaction", tx_index: int, witness_storage: WitnessStorage = WITNESS_STORAGE
+) -> dict[str, list[tuple]]:
+    """
+    Flattens a transaction into row tuples for each transaction related table.
+
+    Parameters:
+        tx (Transaction): The transaction to flatten.
+        tx_index (int): The position of the transaction in its block, the coinbase being 0.
+        witness_storage (WitnessStorage): With ROWS, one witnesses row per witness item, keyed
+            by input and position in the input's stack.
+            With ARCHIVE, one (height, tx_id, witness stacks per input) row to be packed
+            into the block's witness archive (see etl.load.archive_witness_stacks).
+
+    Returns:
+        dict: Rows keyed by table name, in the column order of TRANSACTION_TABLE_COLUMNS.
+    """
+    rows = {
+        TABLE_TRANSACTIONS: [
+            (
+                tx.tx_id,
+                tx.status.block_height,
+                tx_index,
+                tx.v_size,
+                tx.fee_per_vsize,
+                tx.effective_fee_per_vsize,
+                tx.version,
+                tx.lock_time,
+                tx.size,
+                tx.weight,
+                tx.fee,
+            )
+        ],
+        TABLE_TX_OUTPUTS: [
+            (
+                tx.tx_id,
+                index,
+                v_output.script_pubkey,
+                v_output.script_pubkey_asm,
+                v_output.script_pubkey_type,
+                v_output.script_pubkey_address,
+                v_output.value,
+            )
+            for index, v_output in enumerate(tx.v_out)
+        ],
+        TABLE_TX_INPUTS: [
+            (
+                tx.tx_id,
+                index,
+                v_input.prev_tx_id,
+                v_input.v_out,
+                v_input.script_sig,
+                v_input.script_sig_asm,
+                v_input.is_coinbase,
+                v_input.sequence,
+                v_input.inner_redeem_script_asm,
+                v_input.inner_witness_script_asm,
+            )
+            for index, v_input in enumerate(tx.v_in)
+        ],
+        TABLE_ADDRESS_POSTINGS: [
+            (address, tx.status.block_height, tx_index, tx.tx_id, delta)
+            for address, delta in address_deltas(tx).items()
+        ],
+    }
+    if witness_storage is WitnessStorage.ARCHIVE:
+        rows[TABLE_WITNESS_ARCHIVE] = [
+            (tx.status.block_height, tx.tx_id, [v_input.witness for v_input in tx.v_in])
+        ]
+    else:
+        rows[TABLE_WITNESSES] = [
+            (tx.tx_id, v_in_index, item_index, witness)
+            for v_in_index, v_input in enumerate(tx.v_in)
+            for item_index, witness in enumerate(v_input.witness)
+        ]
+    return rows
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def pack_witness_stacks(stacks_by_tx: dict[str, list[list[str]]]) -> bytes:
+    """
+    Packs the witness stacks of several transactions into one compressed blob.
+
+    Every transaction is stored as its 32 byte ID, its input count and, per input, the item
+    count followed by length prefixed raw item bytes, so input and item order are preserved.
+
+    Parameters:
+        stacks_by_tx (dict): Hex encoded witness items per input, keyed by transaction ID.
+
+    Returns:
+        bytes: The zlib compressed archive, readable with WitnessArchive.
+    """
+    buffer = bytearray()
+    for tx_id, stacks in stacks_by_tx.items():
+        buffer += bytes.fromhex(tx_id)
+        _write_varint(buffer, len(stacks))
+        for stack in stacks:
+            _write_varint(buffer, len(stack))
+            for item in stack:
+                raw = bytes.fromhex(item)
+                _write_varint(buffer, len(raw))
+                buffer += raw
+    return zlib.compress(bytes(buffer), WITNESS_COMPRESSION_LEVEL)
+
+
+class WitnessArchive:
+    """Lazy reader of a blob written by pack_witness_stacks.
+
+    Nothing is decompressed until the first lookup, and a transaction's stacks are only
+    decoded when that transaction is requested.
+
+    Attributes:
+        data (bytes): The compressed archive.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._raw = None
+        self._offsets = None
+
+    def _index(self) -> dict[str, int]:
+        if self._offsets is None:
+            self._raw = zlib.decompress(self.data)
+            self._offsets = {}
+            offset = 0
+            while offset < len(self._raw):
+                tx_id = self._raw[offset : offset + 32].hex()
+                offset += 32
+                self._offsets[tx_id] = offset
+                input_count, offset = _read_varint(self._raw, offset)
+                for _ in range(input_count):
+                    item_count, offset = _read_varint(self._raw, offset)
+                    for _ in range(item_count):
+                        length, offset = _read_varint(self._raw, offset)
+                        offset += length
+        return self._offsets
+
+    def tx_ids(self) -> list[str]:
+        return list(self._index())
+
+    def get(self, tx_id: str) -> list[list[str]] | None:
+        """Returns the hex encoded witness items per input of the transaction, None if absent."""
+        offset = self._index().get(tx_id)
+        if offset is None:
+            return None
+
+        stacks = []
+        input_count, offset = _read_varint(self._raw, offset)
+        for _ in range(input_count):
+            stack = []
+            item_count, offset = _read_varint(self._raw, offset)
+            for _ in range(item_count):
+                length, offset = _read_varint(self._raw, offset)
+                stack.append(self._raw[offset : offset + length].hex())
+                offset += length
+            stacks.append(stack)
+        return stacks
+
+    def to_dict(self) -> dict[str, list[list[str]]]:
+        return {tx_id: self.get(tx_id) for tx_id in self.tx_ids()}
+
+
+def decode_transactions_batch(
+    raw: bytes,
+    start_index: int = 0,
+    witness_storage: WitnessStorage = WITNESS_STORAGE,
+    decoding: ModelDecoding | None = None,
+) -> tuple[dict[str, list[tuple]], float]:
+    """
+    Decodes, validates and flattens a raw page of transactions into table rows.
+
+    Meant to run in a worker process: it takes and returns only plain data, so nothing
+    but bytes and row tuples crosses the process boundary.
+
+    Parameters:
+        raw (bytes): The JSON array of transactions as returned by the /txs/ endpoint.
+        start_index (int): The position in the block of the first transaction of the page.
+        witness_storage (WitnessStorage): How witnesses are stored, see transaction_to_rows.
+        decoding (ModelDecoding | None): How the page is decoded, see util.utils.decode_models.
+            Pass it explicitly from the parent, a spawned worker does not inherit its setting.
+
+    Returns:
+        tuple: Rows keyed by table name, in the column order of TRANSACTION_TABLE_COLUMNS, and
+            the seconds spent decoding and validating, for the parent to record as
+            validation_seconds since metrics recorded in a worker process are lost.
+    """
+    from model.transaction import Transaction
+
+    rows = {}
+    started = time.perf_counter()
+    transactions = decode_models(list[Transaction], raw, decoding)
+    validation_seconds = time.perf_counter() - started
+    for tx_index, transaction in enumerate(transactions, start_index):
+        merge_rows(rows, transaction_to_rows(transaction, tx_index, witness_storage))
+    return rows, validation_seconds
+
+
+def merge_rows(target: dict[str, list[tuple]], rows: dict[str, list[tuple]]) -> None:
+    """Appends the rows of one table-keyed mapping onto another, in place."""
+    for table_name, values in rows.items():
+        target.setdefault(table_name, []).extend(values)
+
+
+def diff_transaction_ids(previous: set[str], current: set[str]) -> tuple[list[str], list[str]]:
+    """
+    Returns the transaction IDs added and evicted between two mempool snapshots.
+
+    Both sides are hash sets, so the difference is linear in the snapshot size and stays fast
+    for mempools of hundreds of thousands of transactions.
+
+    Parameters:
+        previous (set): The transaction IDs of the previous snapshot.
+        current (set): The transaction IDs of the current snapshot.
+
+    Returns:
+        tuple: The added and the evicted transaction IDs, each sorted.
+    """
+    return sorted(current - previous), sorted(previous - current)
+
+
+def diff_fee_histogram(
+    previous: list[tuple[float, int]], current: list[tuple[float, int]]
+) -> list[tuple[float, int | None]]:
+    """
+    Returns the fee histogram buckets that changed between two mempool snapshots.
+
+    Parameters:
+        previous (list): The (fee rate, vsize) buckets of the previous snapshot.
+        current (list): The (fee rate, vsize) buckets of the current snapshot.
+
+    Returns:
+        list: The (fee rate, vsize) buckets that are new or changed, plus (fee rate, None)
+            for every bucket that disappeared, as opposed to one whose vsize dropped to 0.
+    """
+    previous_buckets = dict(previous)
+    current_buckets = dict(current)
+    changed = [
+        (fee_rate, v_size)
+        for fee_rate, v_size in current_buckets.items()
+        if previous_buckets.get(fee_rate) != v_size
+    ]
+    changed.extend(
+        (fee_rate, None) for fee_rate in previous_buckets.keys() - current_buckets.keys()
+    )
+    return changed
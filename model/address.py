@@ -0,0 +1,19 @@
+from model.dto import DTOModel
+
+
+class AddressPosting(DTOModel):
+    """One transaction's effect on the balance of an address.
+
+    Attributes:
+        height (int): The height of the block containing the transaction.
+        tx_index (int): The position of the transaction in its block.
+        tx_id (str): The ID of the transaction.
+        delta (int): Net change of the address balance caused by the transaction (in satoshis).
+        balance (int): Running balance of the address after the transaction (in satoshis).
+    """
+
+    height: int
+    tx_index: int
+    tx_id: str
+    delta: int
+    balance: int
@@ -4,3 +4,5 @@ from pydantic import BaseModel
 class DTOModel(BaseModel):
     class Config:
         validate_by_name = True
+        # Validators are built on first use instead of at import, which keeps startup fast.
+        defer_build = True
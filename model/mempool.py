@@ -0,0 +1,21 @@
+from pydantic import Field
+
+from model.dto import DTOModel
+
+
+class Mempool(DTOModel):
+    """Summary of the current mempool.
+
+    Attributes:
+        count (int): Number of transactions in the mempool.
+        v_size (int): Total virtual size of the mempool transactions in vbytes.
+        total_fee (int): Total fees of the mempool transactions (in satoshis).
+        fee_histogram (list[tuple[float, int]]):
+            Fee rate histogram as (fee rate in sat/vB, vsize in vbytes) pairs,
+            ordered from the highest fee rate to the lowest.
+    """
+
+    count: int
+    v_size: int = Field(alias="vsize")
+    total_fee: int
+    fee_histogram: list[tuple[float, int]]
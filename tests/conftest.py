@@ -0,0 +1,33 @@
+import pytest
+
+from bench.stub_server import SyntheticChain
+from db.database import create_tables
+
+
+@pytest.fixture
+def schema_name(tmp_path):
+    path = str(tmp_path / "bitcoin_etl.db")
+    create_tables(path)
+    return path
+
+
+@pytest.fixture
+def load_chain(schema_name):
+    """Returns a function inserting blocks of a SyntheticChain one by one, as the pipeline does."""
+    from etl.load import insert_block, insert_transactions
+    from model.block import Block
+    from model.transaction import Transaction
+
+    def load(chain: SyntheticChain, heights=None, **kwargs) -> None:
+        for height in heights if heights is not None else chain.heights():
+            insert_block(Block.model_validate(chain.block(height)), schema_name)
+            insert_transactions(
+                [
+                    Transaction.model_validate(chain.transaction(height, index))
+                    for index in range(chain.txs_per_block)
+                ],
+                schema_name,
+                **kwargs,
+            )
+
+    return load
@@ -0,0 +1,101 @@
+import sqlite3
+import time
+
+import pytest
+
+from common.config import TABLE_LEASES, LeaseStatus
+from etl import coordinator, pipeline
+from etl.coordinator import (
+    claim_lease,
+    complete_lease,
+    create_leases,
+    heartbeat,
+    lease_status,
+    release_lease,
+    run_worker,
+)
+from util import utils
+
+
+@pytest.fixture
+def coordinator_db(tmp_path):
+    path = str(tmp_path / "coordinator.db")
+    create_leases(100, 109, path, shard_size=5)
+    return path
+
+
+def _expire_lease(coordinator_db: str, start_height: int) -> None:
+    with sqlite3.connect(coordinator_db) as conn:
+        conn.execute(
+            f"UPDATE {TABLE_LEASES} SET heartbeat_at = 0 WHERE start_height = ?", (start_height,)
+        )
+    conn.close()
+
+
+def test_claim_lease_hands_out_each_lease_once(coordinator_db):
+    assert claim_lease("worker-1", coordinator_db) == (100, 104)
+    assert claim_lease("worker-2", coordinator_db) == (105, 109)
+    assert claim_lease("worker-3", coordinator_db) is None
+    assert heartbeat("worker-1", 100, coordinator_db)
+    assert complete_lease("worker-1", 100, coordinator_db)
+    assert lease_status(coordinator_db) == {
+        LeaseStatus.DONE.value: 1,
+        LeaseStatus.LEASED.value: 1,
+    }
+
+
+def test_expired_lease_is_taken_over(coordinator_db):
+    claim_lease("worker-1", coordinator_db)
+    claim_lease("worker-2", coordinator_db)
+    _expire_lease(coordinator_db, 100)
+
+    assert claim_lease("worker-3", coordinator_db) == (100, 104)
+    assert not heartbeat("worker-1", 100, coordinator_db)
+    assert not complete_lease("worker-1", 100, coordinator_db)
+    assert release_lease("worker-1", 100, coordinator_db) is None
+    assert complete_lease("worker-3", 100, coordinator_db)
+
+
+def test_lease_fails_after_max_attempts(coordinator_db):
+    assert claim_lease("worker-1", coordinator_db, max_attempts=2) == (100, 104)
+    assert release_lease("worker-1", 100, coordinator_db, "boom", 2) == LeaseStatus.PENDING
+    assert claim_lease("worker-1", coordinator_db, max_attempts=2) == (105, 109)
+    assert claim_lease("worker-2", coordinator_db, max_attempts=2) == (100, 104)
+    assert release_lease("worker-2", 100, coordinator_db, "boom", 2) == LeaseStatus.FAILED
+
+    _expire_lease(coordinator_db, 105)
+    assert claim_lease("worker-3", coordinator_db, max_attempts=1) is None
+    assert lease_status(coordinator_db) == {LeaseStatus.FAILED.value: 2}
+
+
+def test_leases_split_shards(tmp_path):
+    path = str(tmp_path / "coordinator.db")
+
+    assert create_leases(103, 119, path, shard_size=10, lease_size=5) == 4
+    assert [claim_lease(f"worker-{index}", path) for index in range(4)] == [
+        (103, 104),
+        (105, 109),
+        (110, 114),
+        (115, 119),
+    ]
+    with pytest.raises(ValueError):
+        create_leases(100, 119, path, shard_size=10, lease_size=3)
+
+
+def test_worker_stops_loading_a_lost_lease(coordinator_db, tmp_path, monkeypatch):
+    loaded = []
+
+    def load_block(height, schema_name):
+        loaded.append(height)
+        # Long enough for the heartbeat to find the lease taken over.
+        time.sleep(0.2)
+        return 0
+
+    monkeypatch.setattr(utils, "base_url", utils.base_url)
+    monkeypatch.setattr(pipeline, "load_block", load_block)
+    monkeypatch.setattr(coordinator, "heartbeat", lambda *args: False)
+
+    assert run_worker("worker-1", "http://node", coordinator_db, str(tmp_path), 5, 60, 0.01) == 0
+    assert loaded == [100, 105]
+    # Neither completed nor released, the leases are left to whoever took them over.
+    assert lease_status(coordinator_db) == {LeaseStatus.LEASED.value: 2}
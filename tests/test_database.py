@@ -0,0 +1,139 @@
+import sqlite3
+
+import pytest
+
+from common.config import (
+    TABLE_BLOCKS,
+    TABLE_COINBASE_ADDRESSES,
+    TABLE_TRANSACTIONS,
+    TABLE_WITNESSES,
+)
+from db.database import SCHEMA_VERSION, create_block_tables, create_tables
+
+# Tables as created before the schema was versioned.
+LEGACY_TABLES = [
+    f"""
+    CREATE TABLE {TABLE_COINBASE_ADDRESSES} (
+        height INTEGER PRIMARY KEY,
+        address TEXT NOT NULL,
+        FOREIGN KEY (height) REFERENCES blocks(height) ON DELETE CASCADE
+    )
+    """,
+    f"""
+    CREATE TABLE {TABLE_TRANSACTIONS} (
+        tx_id TEXT PRIMARY KEY,
+        block_height INTEGER NOT NULL,
+        v_size INTEGER NOT NULL,
+        fee_per_vsize INTEGER NOT NULL,
+        effective_fee_per_vsize INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        lock_time INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        weight INTEGER NOT NULL,
+        fee INTEGER NOT NULL,
+        FOREIGN KEY (block_height) REFERENCES blocks(height) ON DELETE CASCADE
+    )
+    """,
+    f"""
+    CREATE TABLE {TABLE_WITNESSES} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tx_id TEXT NOT NULL,
+        witness TEXT NOT NULL,
+        FOREIGN KEY (tx_id) REFERENCES transactions(tx_id) ON DELETE CASCADE
+    )
+    """,
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    with sqlite3.connect(path) as conn:
+        create_block_tables(conn.cursor())
+        conn.execute(f"DROP TABLE {TABLE_COINBASE_ADDRESSES}")
+        for sql in LEGACY_TABLES:
+            conn.execute(sql)
+        for height in (100, 101):
+            conn.execute(
+                f"INSERT INTO {TABLE_BLOCKS} "
+                "VALUES (?, 'hash', 1, 0, 0, 0, 1.0, 'root', 2, 0, 0, 'prev', 0)",
+                (height,),
+            )
+            conn.execute(
+                f"INSERT INTO {TABLE_COINBASE_ADDRESSES} VALUES (?, ?)", (height, f"addr{height}")
+            )
+        # Not in tx_id order, to check that tx_index follows insertion order.
+        for height, tx_id in [(100, "bb"), (100, "aa"), (101, "cc"), (100, "ab")]:
+            conn.execute(
+                f"INSERT INTO {TABLE_TRANSACTIONS} VALUES (?, ?, 1, 1, 1, 1, 0, 1, 1, 0)",
+                (tx_id * 32, height),
+            )
+    conn.close()
+    return path
+
+
+def test_fresh_database_gets_current_version(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    create_tables(path)
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_legacy_database_is_migrated(legacy_db):
+    create_tables(legacy_db)
+    create_tables(legacy_db)
+
+    with sqlite3.connect(legacy_db) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute(
+            f"SELECT tx_id, block_height, tx_index FROM {TABLE_TRANSACTIONS} ORDER BY rowid"
+        ).fetchall() == [
+            ("bb" * 32, 100, 0),
+            ("aa" * 32, 100, 1),
+            ("cc" * 32, 101, 0),
+            ("ab" * 32, 100, 2),
+        ]
+        conn.execute(f"INSERT INTO {TABLE_COINBASE_ADDRESSES} (height, address) VALUES (100, 'x')")
+        assert conn.execute(
+            f"SELECT height, address FROM {TABLE_COINBASE_ADDRESSES} ORDER BY id"
+        ).fetchall() == [(100, "addr100"), (101, "addr101"), (100, "x")]
+    conn.close()
+
+
+def test_newer_schema_version_is_refused(tmp_path):
+    path = str(tmp_path / "newer.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    conn.close()
+
+    with pytest.raises(RuntimeError, match="schema version"):
+        create_tables(path)
+
+
+def test_empty_legacy_witnesses_are_rekeyed(legacy_db):
+    create_tables(legacy_db)
+
+    with sqlite3.connect(legacy_db) as conn:
+        conn.execute(f"INSERT INTO {TABLE_WITNESSES} VALUES (?, 0, 0, '00')", ("aa" * 32,))
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_WITNESSES})")]
+    conn.close()
+    assert columns == ["tx_id", "v_in_index", "item_index", "witness"]
+
+
+def test_legacy_witness_items_are_refused(legacy_db):
+    with sqlite3.connect(legacy_db) as conn:
+        conn.execute(
+            f"INSERT INTO {TABLE_WITNESSES} (tx_id, witness) VALUES (?, '00')", ("cc" * 32,)
+        )
+    conn.close()
+
+    with pytest.raises(RuntimeError, match="heights 101 to 101"):
+        create_tables(legacy_db)
+    with sqlite3.connect(legacy_db) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert "tx_index" not in [
+            row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_TRANSACTIONS})")
+        ]
+    conn.close()
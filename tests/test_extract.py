@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from bench.stub_server import StubServer, SyntheticChain
+from common.config import ModelDecoding
+from etl.extract import get_transactions_batch
+from model.transaction import Transaction
+from util import utils
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = SyntheticChain(100, 1, txs_per_block=12)
+    with StubServer(chain) as server:
+        monkeypatch.setattr(utils, "base_url", server.url)
+        yield chain
+
+
+@pytest.mark.parametrize("decoding", list(ModelDecoding))
+def test_transactions_batch_decodes_with_either_strategy(chain, monkeypatch, decoding):
+    monkeypatch.setattr(utils, "model_decoding", decoding)
+
+    assert get_transactions_batch(chain.block_hash(100), 10) == [
+        Transaction.model_validate(chain.transaction(100, index)) for index in (10, 11)
+    ]
+
+
+def test_decode_then_validate_uses_the_json_decoder(chain, monkeypatch):
+    decoded = []
+
+    def decoder(raw: bytes):
+        decoded.append(raw)
+        return json.loads(raw)
+
+    monkeypatch.setattr(utils, "model_decoding", ModelDecoding.DECODE_THEN_VALIDATE)
+    monkeypatch.setattr(utils, "json_decoder", decoder)
+    transactions = get_transactions_batch(chain.block_hash(100))
+
+    assert len(decoded) == 1
+    assert [transaction.tx_id for transaction in transactions] == [
+        chain.tx_id(100, index) for index in range(10)
+    ]
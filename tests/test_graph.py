@@ -0,0 +1,25 @@
+from bench.stub_server import SyntheticChain
+from etl.graph import export_graph, open_graph
+
+TXS_PER_BLOCK = 4
+
+
+def test_graph_export_links_transactions_to_funding(schema_name, load_chain, tmp_path):
+    chain = SyntheticChain(100, 4, txs_per_block=TXS_PER_BLOCK)
+    directory = str(tmp_path / "graph")
+    load_chain(chain, chain.heights()[:2])
+    export_graph(directory, schema_name=schema_name)
+    load_chain(chain, chain.heights()[2:])
+    meta = export_graph(directory, schema_name=schema_name)
+
+    graph = open_graph(directory)
+    assert meta["last_height"] == 103
+    assert graph.node_count == meta["node_count"]
+    assert len(graph.indices) == meta["edge_count"]
+    for height in chain.heights():
+        for index in range(TXS_PER_BLOCK):
+            transaction = chain.transaction(height, index)
+            funding = {vin["txid"] for vin in transaction["vin"] if not vin["is_coinbase"]}
+            node_id = graph.node_id(transaction["txid"])
+            assert graph.tx_id(node_id) == transaction["txid"]
+            assert {graph.tx_id(node) for node in graph.funding(node_id)} == funding
@@ -0,0 +1,151 @@
+import sqlite3
+
+import pytest
+
+from bench.stub_server import SyntheticChain
+from common.config import (
+    TABLE_ADDRESS_POSTINGS,
+    TABLE_TRANSACTIONS,
+    TABLE_TX_INPUTS,
+    TABLE_TX_OUTPUTS,
+    TABLE_WITNESS_ARCHIVE,
+    TABLE_WITNESSES,
+    WitnessStorage,
+)
+from db.database import create_tables, staging_table
+from etl.load import (
+    finish_bulk_load,
+    insert_block,
+    insert_transaction,
+    stage_transactions,
+    start_bulk_load,
+)
+from model.block import Block
+from model.transaction import Transaction
+
+LOADED_TABLES = [
+    TABLE_TRANSACTIONS,
+    TABLE_TX_OUTPUTS,
+    TABLE_TX_INPUTS,
+    TABLE_WITNESSES,
+    TABLE_ADDRESS_POSTINGS,
+    TABLE_WITNESS_ARCHIVE,
+]
+
+
+def _bulk_load(
+    chain: SyntheticChain,
+    schema_name: str,
+    heights=None,
+    with_blocks: bool = True,
+    witness_storage: WitnessStorage = WitnessStorage.ROWS,
+    page_size: int = 2,
+) -> dict[str, int]:
+    start_bulk_load(schema_name)
+    for height in heights if heights is not None else chain.heights():
+        if with_blocks:
+            insert_block(Block.model_validate(chain.block(height)), schema_name)
+        transactions = [
+            Transaction.model_validate(chain.transaction(height, index))
+            for index in range(chain.txs_per_block)
+        ]
+        for start in range(0, len(transactions), page_size):
+            stage_transactions(
+                transactions[start : start + page_size], schema_name, witness_storage, start
+            )
+    return finish_bulk_load(schema_name)
+
+
+def _dump(schema_name: str) -> dict[str, list[tuple]]:
+    with sqlite3.connect(schema_name) as conn:
+        tables = {
+            table_name: sorted(conn.execute(f"SELECT * FROM {table_name}").fetchall())
+            for table_name in LOADED_TABLES
+        }
+    conn.close()
+    return tables
+
+
+def _indexes(schema_name: str) -> list[tuple]:
+    with sqlite3.connect(schema_name) as conn:
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' ORDER BY name"
+        ).fetchall()
+    conn.close()
+    return indexes
+
+
+@pytest.mark.parametrize("witness_storage", list(WitnessStorage))
+def test_bulk_load_matches_direct_inserts(tmp_path, schema_name, load_chain, witness_storage):
+    chain = SyntheticChain(100, 3, txs_per_block=5)
+    load_chain(chain, witness_storage=witness_storage)
+    bulk_schema_name = str(tmp_path / "bulk.db")
+    create_tables(bulk_schema_name)
+
+    assert _bulk_load(chain, bulk_schema_name, witness_storage=witness_storage) == {}
+    assert _dump(bulk_schema_name) == _dump(schema_name)
+    assert _indexes(bulk_schema_name) == _indexes(schema_name)
+
+
+def test_bulk_load_defers_secondary_indexes(schema_name, monkeypatch):
+    statements = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", traced_connect)
+    _bulk_load(SyntheticChain(100, 1, txs_per_block=3), schema_name)
+    monkeypatch.undo()
+
+    def position(prefix: str) -> int:
+        return next(i for i, sql in enumerate(statements) if sql.lstrip().startswith(prefix))
+
+    merge = position(f"INSERT OR REPLACE INTO {TABLE_TRANSACTIONS} ")
+    assert position("DROP INDEX idx_transactions_block_height") < merge
+    assert position("CREATE INDEX idx_transactions_block_height") > merge
+
+
+def test_bulk_load_reports_violations_of_its_own_rows(schema_name):
+    chain = SyntheticChain(100, 3, txs_per_block=3)
+
+    # The block of height 101 is not loaded, so its transactions reference a missing block.
+    assert _bulk_load(chain, schema_name, [101], with_blocks=False) == {
+        f"{TABLE_TRANSACTIONS} -> blocks": 3
+    }
+    assert _bulk_load(chain, schema_name, [102]) == {}
+
+
+def test_failed_merge_restores_indexes(schema_name):
+    indexes = _indexes(schema_name)
+    start_bulk_load(schema_name)
+    with sqlite3.connect(schema_name) as conn:
+        conn.execute(f"DROP TABLE {staging_table(TABLE_ADDRESS_POSTINGS)}")
+    conn.close()
+
+    with pytest.raises(sqlite3.OperationalError):
+        finish_bulk_load(schema_name)
+    assert _indexes(schema_name) == indexes
+
+
+def test_insert_transaction_keeps_the_baseline_signature(schema_name, load_chain):
+    chain = SyntheticChain(100, 2, txs_per_block=3)
+    load_chain(chain, [100])
+    insert_block(Block.model_validate(chain.block(101)), schema_name)
+    transactions = [Transaction.model_validate(chain.transaction(101, index)) for index in range(3)]
+
+    # Without tx_index, transactions are appended in insertion order and keep their position.
+    for transaction in transactions[:2]:
+        insert_transaction(transaction, schema_name)
+    insert_transaction(transactions[0], schema_name)
+    insert_transaction(transactions[2], schema_name, tx_index=2)
+
+    with sqlite3.connect(schema_name) as conn:
+        rows = conn.execute(
+            f"SELECT tx_id, tx_index FROM {TABLE_TRANSACTIONS} WHERE block_height = 101 "
+            "ORDER BY tx_index"
+        ).fetchall()
+    conn.close()
+    assert rows == [(transaction.tx_id, index) for index, transaction in enumerate(transactions)]
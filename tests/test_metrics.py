@@ -0,0 +1,68 @@
+import json
+import urllib.request
+
+import pytest
+
+from common import metrics
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    metrics.reset()
+    with metrics.timer("sqlite_commit_seconds"):
+        pass
+    metrics.increment("blocks_loaded_total")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == [] and snapshot["histograms"] == []
+
+
+def test_to_json(recording):
+    metrics.increment("rows_inserted_total", 3, table="blocks")
+    metrics.observe("sqlite_statement_seconds", 0.002, table="blocks")
+    metrics.observe("sqlite_statement_seconds", 20.0, table="blocks")
+
+    data = json.loads(metrics.to_json())
+    (counter,) = data["counters"]
+    assert counter["labels"] == {"table": "blocks"} and counter["value"] == 3
+    (histogram,) = data["histograms"]
+    assert histogram["count"] == 2 and histogram["sum"] == pytest.approx(20.002)
+    assert histogram["buckets"]["0.001"] == 0
+    assert histogram["buckets"]["0.0025"] == 1
+    assert histogram["buckets"]["10.0"] == 1
+    assert histogram["buckets"]["+Inf"] == 2
+
+
+def test_to_prometheus_escapes_label_values(recording):
+    metrics.increment("rows_inserted_total", 2, table='say "hi"\\\n')
+    metrics.observe("http_request_seconds", 0.3, endpoint="/block/:hash")
+
+    lines = metrics.to_prometheus().splitlines()
+    assert "# TYPE rows_inserted_total counter" in lines
+    assert 'rows_inserted_total{table="say \\"hi\\"\\\\\\n"} 2' in lines
+    assert "# TYPE http_request_seconds histogram" in lines
+    assert 'http_request_seconds_bucket{endpoint="/block/:hash",le="0.25"} 0' in lines
+    assert 'http_request_seconds_bucket{endpoint="/block/:hash",le="+Inf"} 1' in lines
+    assert 'http_request_seconds_count{endpoint="/block/:hash"} 1' in lines
+
+
+def test_serve_exposes_metrics(recording):
+    metrics.increment("blocks_loaded_total")
+    server = metrics.serve(port=0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            assert "blocks_loaded_total 1" in response.read().decode().splitlines()
+        with urllib.request.urlopen(f"{url}/metrics.json") as response:
+            assert json.load(response)["counters"][0]["name"] == "blocks_loaded_total"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from bench.stub_server import StubServer, SyntheticChain
+from common import metrics
+from common.config import TABLE_TRANSACTIONS, TABLE_TX_INPUTS, TABLE_TX_OUTPUTS
+from db.database import create_tables
+from etl import pipeline
+from util import utils
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = SyntheticChain(100, 3, txs_per_block=12)
+    with StubServer(chain) as server:
+        monkeypatch.setattr(utils, "base_url", server.url)
+        yield chain
+
+
+def _dump(schema_name: str) -> dict[str, list[tuple]]:
+    with sqlite3.connect(schema_name) as conn:
+        tables = {
+            table_name: sorted(conn.execute(f"SELECT * FROM {table_name}").fetchall())
+            for table_name in (TABLE_TRANSACTIONS, TABLE_TX_OUTPUTS, TABLE_TX_INPUTS)
+        }
+    conn.close()
+    return tables
+
+
+def test_parallel_load_matches_serial_load(chain, schema_name, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    parallel_schema_name = str(tmp_path / "parallel.db")
+    create_tables(parallel_schema_name)
+
+    assert pipeline.load_blocks(100, 102, schema_name) == 36
+    assert pipeline.load_blocks_parallel(100, 102, parallel_schema_name, workers=2) == 36
+    assert _dump(parallel_schema_name) == _dump(schema_name)
+
+    # Every pool decoded page is recorded, as are the pages decoded by the serial load.
+    (validation,) = [
+        histogram
+        for histogram in metrics.snapshot()["histograms"]
+        if histogram["name"] == "validation_seconds"
+        and histogram["labels"] == {"model": "Transaction"}
+    ]
+    assert validation["count"] == 2 * 3 * 2
+    metrics.reset()
+
+
+def test_parallel_load_decodes_next_block_while_inserting(chain, schema_name, monkeypatch):
+    events = []
+    get_block_by_height, insert_block = pipeline.get_block_by_height, pipeline.insert_block
+
+    def traced_get_block_by_height(height):
+        events.append(("get", height))
+        return get_block_by_height(height)
+
+    def traced_insert_block(block, schema_name):
+        events.append(("insert", block.height))
+        insert_block(block, schema_name)
+
+    monkeypatch.setattr(pipeline, "get_block_by_height", traced_get_block_by_height)
+    monkeypatch.setattr(pipeline, "insert_block", traced_insert_block)
+    pipeline.load_blocks_parallel(100, 102, schema_name, workers=2)
+
+    assert events == [
+        ("get", 100),
+        ("get", 101),
+        ("insert", 100),
+        ("get", 102),
+        ("insert", 101),
+        ("insert", 102),
+    ]
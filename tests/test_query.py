@@ -0,0 +1,94 @@
+import sqlite3
+
+from bench.stub_server import SyntheticChain
+from common.config import TABLE_ADDRESS_POSTINGS
+from etl.load import insert_mempool_snapshot
+from etl.query import (
+    get_address_balance,
+    get_address_history,
+    get_mempool_fee_histogram,
+    get_mempool_transaction_ids,
+)
+from etl.transform import diff_fee_histogram, diff_transaction_ids
+from model.mempool import Mempool
+
+
+def test_address_history_pages_continue_running_balance(schema_name, load_chain):
+    chain = SyntheticChain(100, 6, txs_per_block=4)
+    load_chain(chain)
+    with sqlite3.connect(schema_name) as conn:
+        (address,) = conn.execute(
+            f"""
+            SELECT address FROM {TABLE_ADDRESS_POSTINGS}
+            GROUP BY address ORDER BY COUNT(*) DESC LIMIT 1
+        """
+        ).fetchone()
+    conn.close()
+
+    history = get_address_history(address, page_size=1000, schema_name=schema_name)
+    pages, after = [], None
+    while page := get_address_history(address, after, page_size=2, schema_name=schema_name):
+        pages.extend(page)
+        after = page[-1]
+
+    assert len(history) > 2
+    assert pages == history
+    assert [(p.height, p.tx_index) for p in history] == sorted(
+        (p.height, p.tx_index) for p in history
+    )
+    assert history[-1].balance == get_address_balance(address, schema_name)
+
+
+def test_mempool_snapshots_replay_to_transaction_ids(schema_name):
+    snapshots = [
+        {"a" * 64, "b" * 64, "c" * 64},
+        {"b" * 64, "c" * 64, "d" * 64},
+        {"d" * 64},
+        {"d" * 64, "a" * 64, "e" * 64},
+    ]
+    previous, snapshot_ids = set(), []
+    for timestamp, tx_ids in enumerate(snapshots):
+        added, evicted = diff_transaction_ids(previous, tx_ids)
+        mempool = Mempool(count=len(tx_ids), vsize=0, total_fee=0, fee_histogram=[])
+        snapshot_ids.append(
+            insert_mempool_snapshot(
+                mempool, timestamp, added, evicted, [], not previous, schema_name
+            )
+        )
+        previous = tx_ids
+
+    for snapshot_id, tx_ids in zip(snapshot_ids, snapshots):
+        assert get_mempool_transaction_ids(snapshot_id, schema_name) == tx_ids
+
+
+def test_mempool_replay_starts_at_latest_full_snapshot(schema_name):
+    mempool = Mempool(count=0, vsize=0, total_fee=0, fee_histogram=[])
+    insert_mempool_snapshot(mempool, 0, ["a" * 64], [], [], True, schema_name)
+    full_snapshot_id = insert_mempool_snapshot(mempool, 1, ["b" * 64], [], [], True, schema_name)
+    delta_snapshot_id = insert_mempool_snapshot(mempool, 2, ["c" * 64], [], [], False, schema_name)
+
+    assert get_mempool_transaction_ids(full_snapshot_id, schema_name) == {"b" * 64}
+    assert get_mempool_transaction_ids(delta_snapshot_id, schema_name) == {"b" * 64, "c" * 64}
+
+
+def test_mempool_snapshots_replay_to_fee_histogram(schema_name):
+    histograms = [
+        [(20.0, 1000), (10.0, 5000), (1.0, 9000)],
+        [(25.0, 300), (20.0, 1000), (10.0, 4000), (1.0, 0)],
+        [(25.0, 300), (10.0, 4000)],
+        [],
+    ]
+    previous, snapshot_ids = None, []
+    for timestamp, histogram in enumerate(histograms):
+        delta = diff_fee_histogram(previous or [], histogram)
+        mempool = Mempool(count=0, vsize=0, total_fee=0, fee_histogram=histogram)
+        snapshot_ids.append(
+            insert_mempool_snapshot(
+                mempool, timestamp, [], [], delta, previous is None, schema_name
+            )
+        )
+        previous = histogram
+
+    for snapshot_id, histogram in zip(snapshot_ids, histograms):
+        assert get_mempool_fee_histogram(snapshot_id, schema_name) == histogram
+    assert get_mempool_fee_histogram(0, schema_name) == []
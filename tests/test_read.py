@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from bench.stub_server import SyntheticChain
+from etl import read
+from model.block import Block
+from model.transaction import Transaction
+
+
+@pytest.fixture
+def chain(schema_name, load_chain):
+    chain = SyntheticChain(100, 3, txs_per_block=3)
+    load_chain(chain)
+    read.clear_cache()
+    return chain
+
+
+def test_block_round_trip(chain, schema_name):
+    assert read.get_block(101, schema_name, fallback=False) == Block.model_validate(
+        chain.block(101)
+    )
+    assert read.get_block(103, schema_name, fallback=False) is None
+
+
+def test_block_transactions_round_trip(chain, schema_name):
+    assert read.get_block_transactions(101, schema_name, fallback=False) == [
+        Transaction.model_validate(chain.transaction(101, index)) for index in range(3)
+    ]
+    # The inputs of the first loaded block spend transactions that are not loaded.
+    assert read.get_block_transactions(100, schema_name, fallback=False) is None
+
+
+def test_coinbase_addresses_keep_their_order(schema_name, load_chain):
+    chain = SyntheticChain(100, 1, txs_per_block=1)
+    block = chain.block(100)
+    block["extras"]["coinbaseAddresses"] = ["bc1qz", "bc1qa", "bc1qm"]
+    chain.block = lambda height: block
+    load_chain(chain)
+    read.clear_cache()
+
+    block = read.get_block(100, schema_name, fallback=False)
+    assert block.extras.coinbase_addresses == ["bc1qz", "bc1qa", "bc1qm"]
+
+
+def test_reads_do_not_scan_tables(chain, schema_name, monkeypatch):
+    statements = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", traced_connect)
+    read.get_block(101, schema_name, fallback=False)
+    read.get_block_transactions(101, schema_name, fallback=False)
+    read.get_transaction(chain.tx_id(102, 1), schema_name, fallback=False)
+    monkeypatch.undo()
+
+    queries = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert queries
+    with sqlite3.connect(schema_name) as conn:
+        for sql in queries:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            assert not [
+                step for step in plan if step.startswith("SCAN ") and "subquery" not in step
+            ]
+    conn.close()
@@ -0,0 +1,109 @@
+import sqlite3
+from statistics import median
+
+import pytest
+
+from bench.stub_server import SyntheticChain
+from common.config import TABLE_BLOCK_ROLLUPS, TABLE_POOL_ROLLUPS, RollupBucket
+from etl.load import insert_block, rebuild_rollups
+from etl.rollup import bucket_start
+from model.block import Block
+
+# 2023-11-14 22:13:20 UTC, a Tuesday.
+TIMESTAMP = 1_700_000_000
+
+
+def _rollups(schema_name: str) -> dict[str, list[tuple]]:
+    with sqlite3.connect(schema_name) as conn:
+        tables = {
+            table_name: conn.execute(f"SELECT * FROM {table_name} ORDER BY 1, 2, 3").fetchall()
+            for table_name in (TABLE_BLOCK_ROLLUPS, TABLE_POOL_ROLLUPS)
+        }
+    conn.close()
+    return tables
+
+
+def _assert_matches_rebuild(schema_name: str, start_height: int, end_height: int) -> None:
+    incremental = _rollups(schema_name)
+    rebuild_rollups(start_height, end_height, schema_name)
+    rebuilt = _rollups(schema_name)
+    assert incremental.keys() == rebuilt.keys()
+    for table_name, rows in rebuilt.items():
+        assert incremental[table_name] == [pytest.approx(row) for row in rows]
+
+
+def test_bucket_start_boundaries():
+    assert bucket_start(TIMESTAMP, RollupBucket.HOURLY) == 1_699_999_200
+    assert bucket_start(TIMESTAMP, RollupBucket.DAILY) == 1_699_920_000
+    # Monday 2023-11-13 00:00 UTC.
+    assert bucket_start(TIMESTAMP, RollupBucket.WEEKLY) == 1_699_833_600
+    assert bucket_start(1_699_833_600, RollupBucket.WEEKLY) == 1_699_833_600
+    assert bucket_start(1_699_833_599, RollupBucket.WEEKLY) == 1_699_833_600 - 7 * 86400
+
+
+def test_incremental_rollups_match_rebuild(schema_name, load_chain):
+    chain = SyntheticChain(100, 12, txs_per_block=2)
+    load_chain(chain)
+
+    with sqlite3.connect(schema_name) as conn:
+        hourly = conn.execute(
+            f"SELECT bucket_start, block_count, min_height, max_height FROM {TABLE_BLOCK_ROLLUPS} "
+            "WHERE bucket = ? ORDER BY bucket_start",
+            (RollupBucket.HOURLY.value,),
+        ).fetchall()
+    conn.close()
+    # Blocks are 10 minutes apart from 22:13:20, the first hour holds 5 of them.
+    assert hourly == [
+        (1_699_999_200, 5, 100, 104),
+        (1_700_002_800, 6, 105, 110),
+        (1_700_006_400, 1, 111, 111),
+    ]
+    _assert_matches_rebuild(schema_name, 100, 111)
+
+
+def test_median_fee_and_pool_share(schema_name):
+    chain = SyntheticChain(100, 4, txs_per_block=2)
+    median_fees = [1.0, 4.0, 2.0, 10.0]
+    for height, median_fee in zip(chain.heights(), median_fees):
+        block = chain.block(height)
+        block["extras"]["medianFee"] = median_fee
+        block["extras"]["pool"]["id"] = 7 if height < 103 else 8
+        insert_block(Block.model_validate(block), schema_name)
+
+    with sqlite3.connect(schema_name) as conn:
+        (median_fee,) = conn.execute(
+            f"SELECT median_fee FROM {TABLE_BLOCK_ROLLUPS} WHERE bucket = ?",
+            (RollupBucket.DAILY.value,),
+        ).fetchone()
+        shares = conn.execute(
+            f"SELECT pool_id, block_count, share FROM {TABLE_POOL_ROLLUPS} "
+            "WHERE bucket = ? ORDER BY pool_id",
+            (RollupBucket.DAILY.value,),
+        ).fetchall()
+    conn.close()
+
+    assert median_fee == median(median_fees) == 3.0
+    assert shares == [(7, 3, 0.75), (8, 1, 0.25)]
+    _assert_matches_rebuild(schema_name, 100, 103)
+
+
+def test_reinserted_block_leaves_its_old_bucket(schema_name, load_chain):
+    chain = SyntheticChain(100, 6, txs_per_block=2)
+    load_chain(chain)
+
+    # Moved from the first hour into the next day, with another pool.
+    block = chain.block(101)
+    block["timestamp"] += 86400
+    block["extras"]["pool"]["id"] = 9
+    insert_block(Block.model_validate(block), schema_name)
+
+    with sqlite3.connect(schema_name) as conn:
+        counts = conn.execute(
+            f"SELECT bucket_start, block_count FROM {TABLE_BLOCK_ROLLUPS} "
+            "WHERE bucket = ? ORDER BY bucket_start",
+            (RollupBucket.DAILY.value,),
+        ).fetchall()
+    conn.close()
+
+    assert counts == [(1_699_920_000, 5), (1_700_006_400, 1)]
+    _assert_matches_rebuild(schema_name, 100, 105)
@@ -0,0 +1,51 @@
+from collections import Counter
+
+import pytest
+
+from bench.stub_server import SyntheticChain
+from common.config import TABLE_BLOCK_ROLLUPS, TABLE_BLOCKS, RollupBucket
+from db.database import create_tables
+from db.shards import attached_shards, shard_path
+from etl.load import insert_block
+from etl.rollup import bucket_start
+from model.block import Block
+
+SHARD_SIZE = 2
+
+
+@pytest.fixture
+def chain(tmp_path):
+    chain = SyntheticChain(100, 5, txs_per_block=1)
+    for height in chain.heights():
+        path = shard_path(height, str(tmp_path), SHARD_SIZE)
+        create_tables(path)
+        insert_block(Block.model_validate(chain.block(height)), path)
+    return chain
+
+
+def test_views_union_height_partitioned_tables(chain, tmp_path):
+    with attached_shards(100, 104, str(tmp_path), SHARD_SIZE) as conn:
+        heights = [row[0] for row in conn.execute(f"SELECT height FROM {TABLE_BLOCKS}")]
+        rollup_count = conn.execute(f"SELECT COUNT(*) FROM {TABLE_BLOCK_ROLLUPS}").fetchone()[0]
+
+    assert sorted(heights) == list(chain.heights())
+    # Not the partial rollups of the first shard.
+    assert rollup_count == 0
+
+
+def test_rollups_are_recomputed_over_the_union(chain, tmp_path):
+    with attached_shards(100, 104, str(tmp_path), SHARD_SIZE, rollups=True) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT bucket_start, block_count, min_height, max_height FROM {TABLE_BLOCK_ROLLUPS}
+            WHERE bucket = ? ORDER BY bucket_start
+        """,
+            (RollupBucket.HOURLY.value,),
+        ).fetchall()
+
+    blocks_per_hour = Counter(
+        bucket_start(chain.timestamp(height), RollupBucket.HOURLY) for height in chain.heights()
+    )
+    assert [(start, count) for start, count, _, _ in rows] == sorted(blocks_per_hour.items())
+    assert rows[0][2] == 100 and rows[-1][3] == 104
+    assert sum(count for _, count, _, _ in rows) == 5
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time in milliseconds allowed per entry point, about three times what was
+# measured when the heavy dependencies were made lazy, to absorb slower machines.
+IMPORT_BUDGETS_MS = {
+    "run": 100,
+    "etl.load": 120,
+    "etl.coordinator": 150,
+    "etl.pipeline": 600,
+}
+
+# Heavy dependencies an entry point must not import until they are actually used.
+DEFERRED_IMPORTS = {
+    "run": ["pydantic", "requests", "tenacity", "numpy"],
+    "etl.load": ["pydantic", "requests", "tenacity", "numpy"],
+    "etl.coordinator": ["pydantic", "requests", "tenacity", "numpy"],
+    "etl.pipeline": ["requests", "tenacity", "numpy"],
+}
+
+
+def _run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def _import_time_ms(module: str) -> float:
+    """Returns the cumulative import time of a module in a fresh interpreter, best of three."""
+    timings = []
+    for _ in range(3):
+        stderr = _run_python("-X", "importtime", "-c", f"import {module}").stderr
+        # The last line is the module itself: "import time: self | cumulative | name".
+        cumulative = stderr.strip().splitlines()[-1].split("|")[1]
+        timings.append(int(cumulative) / 1000)
+    return min(timings)
+
+
+@pytest.mark.parametrize("module", IMPORT_BUDGETS_MS)
+def test_import_time_within_budget(module):
+    elapsed = _import_time_ms(module)
+    assert (
+        elapsed <= IMPORT_BUDGETS_MS[module]
+    ), f"Importing {module} took {elapsed:.1f} ms, budget is {IMPORT_BUDGETS_MS[module]} ms."
+
+
+@pytest.mark.parametrize("module", DEFERRED_IMPORTS)
+def test_heavy_dependencies_are_deferred(module):
+    stdout = _run_python(
+        "-c",
+        f"import json, sys, {module}; "
+        f"print(json.dumps([m for m in {DEFERRED_IMPORTS[module]!r} if m in sys.modules]))",
+    ).stdout
+    assert json.loads(stdout) == []
+
+
+def test_model_schemas_are_built_on_first_use():
+    stdout = _run_python(
+        "-c",
+        "from model.block import Block; "
+        "from model.transaction import Transaction; "
+        "print(Block.__pydantic_complete__, Transaction.__pydantic_complete__)",
+    ).stdout
+    assert stdout.split() == ["False", "False"]
@@ -0,0 +1,64 @@
+import pytest
+
+from etl.transform import (
+    WitnessArchive,
+    diff_fee_histogram,
+    diff_transaction_ids,
+    pack_witness_stacks,
+)
+
+TX_A = "aa" * 32
+TX_B = "bb" * 32
+TX_C = "cc" * 32
+
+
+@pytest.mark.parametrize(
+    "stacks_by_tx",
+    [
+        {},
+        {TX_A: []},
+        {TX_A: [[]]},
+        {TX_A: [["3044" + "01" * 70, "02" + "ab" * 32]]},
+        {
+            TX_A: [["00"], [], ["", "ff" * 300, "51"]],
+            TX_B: [[]],
+            TX_C: [["de", "ad"], ["be", "ef"]],
+        },
+    ],
+    ids=["no transactions", "no inputs", "empty stack", "one stack", "several transactions"],
+)
+def test_witness_archive_round_trip(stacks_by_tx):
+    archive = WitnessArchive(pack_witness_stacks(stacks_by_tx))
+
+    assert archive.tx_ids() == list(stacks_by_tx)
+    assert archive.to_dict() == stacks_by_tx
+    for tx_id, stacks in stacks_by_tx.items():
+        assert archive.get(tx_id) == stacks
+
+
+def test_witness_archive_misses_unknown_transaction():
+    archive = WitnessArchive(pack_witness_stacks({TX_A: [["00"]]}))
+
+    assert archive.get(TX_B) is None
+
+
+def test_diff_transaction_ids():
+    added, evicted = diff_transaction_ids({TX_A, TX_B}, {TX_C, TX_B})
+
+    assert added == [TX_C]
+    assert evicted == [TX_A]
+    assert diff_transaction_ids({TX_A}, {TX_A}) == ([], [])
+    assert diff_transaction_ids(set(), {TX_B, TX_A}) == ([TX_A, TX_B], [])
+
+
+def test_diff_fee_histogram():
+    previous = [(20.0, 1000), (10.0, 5000), (1.0, 9000)]
+    current = [(25.0, 300), (20.0, 1000), (10.0, 4000), (5.0, 0)]
+
+    assert sorted(diff_fee_histogram(previous, current)) == [
+        (1.0, None),
+        (5.0, 0),
+        (10.0, 4000),
+        (25.0, 300),
+    ]
+    assert diff_fee_histogram(current, current) == []
@@ -1,31 +1,124 @@
+import json
 import logging
-from typing import Callable, TypeVar
-
-import requests
-from tenacity import (
-    after_log,
-    before_log,
-    before_sleep_log,
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
-
-from common.config import BASE_URL, DEFAULT_TIMEOUT, Api
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+from common import metrics
+from common.config import BASE_URL, DEFAULT_TIMEOUT, MODEL_DECODING, Api, ModelDecoding
 from common.logger import setup_logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# requests, tenacity and pydantic are imported on first use, so entry points that never touch
+# the API or validate JSON do not pay for them at startup.
+if TYPE_CHECKING:
+    import requests
+    from pydantic import TypeAdapter
+
 logger = setup_logger(__name__)
 
-retry_decorator = retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=1, max=10),
-    retry=retry_if_exception_type(requests.exceptions.RequestException),
-    reraise=True,
-    before=before_log(logger, logging.DEBUG),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    after=after_log(logger, logging.INFO),
-)
+base_url = BASE_URL
+
+# Decodes JSON response bodies; orjson when installed, the standard library otherwise.
+json_decoder: Callable[[bytes], Any] = orjson.loads if orjson is not None else json.loads
+# How raw JSON is turned into models, see decode_models.
+model_decoding = MODEL_DECODING
+
+
+@lru_cache
+def retry_decorator() -> Callable:
+    """Returns the retry policy of API requests, built on first use."""
+    import requests
+    from tenacity import (
+        after_log,
+        before_log,
+        before_sleep_log,
+        retry,
+        retry_if_exception_type,
+        stop_after_attempt,
+        wait_exponential,
+    )
+
+    return retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        retry=retry_if_exception_type(requests.exceptions.RequestException),
+        reraise=True,
+        before=before_log(logger, logging.DEBUG),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        after=after_log(logger, logging.INFO),
+    )
+
+
+def set_json_decoder(decoder: Callable[[bytes], Any]) -> None:
+    """Replaces the function decoding JSON response bodies, e.g. with json.loads."""
+    global json_decoder
+    json_decoder = decoder
+
+
+def set_model_decoding(decoding: ModelDecoding) -> None:
+    """Selects how raw JSON is turned into models, see decode_models."""
+    global model_decoding
+    model_decoding = decoding
+
+
+@lru_cache
+def _type_adapter(type_: Any) -> "TypeAdapter":
+    from pydantic import TypeAdapter
+
+    return TypeAdapter(type_)
+
+
+def validate_json(type_: Any, raw: bytes) -> Any:
+    """
+    Parses and validates raw JSON straight into the given type (e.g. list[Transaction]).
+
+    Uses pydantic's own parser, so no intermediate dicts are built.
+
+    Parameters:
+        type_: The type to validate into, a pydantic model or a generic like list[Model].
+        raw (bytes): The JSON document.
+
+    Returns:
+        The validated value.
+
+    Raises:
+        pydantic.ValidationError: If the document does not match the type.
+    """
+    return _type_adapter(type_).validate_json(raw)
+
+
+def decode_models(type_: Any, raw: bytes, decoding: ModelDecoding | None = None) -> Any:
+    """
+    Decodes and validates raw JSON into the given type with the selected strategy.
+
+    Which strategy is faster depends on the pydantic and orjson versions and on the documents,
+    compare them with bench.decode.
+
+    Parameters:
+        type_: The type to validate into, a pydantic model or a generic like list[Model].
+        raw (bytes): The JSON document.
+        decoding (ModelDecoding | None): The strategy, defaults to the one set with
+            set_model_decoding.
+
+    Returns:
+        The validated value.
+
+    Raises:
+        pydantic.ValidationError: If the document does not match the type.
+    """
+    if (decoding or model_decoding) is ModelDecoding.VALIDATE_JSON:
+        return validate_json(type_, raw)
+    return _type_adapter(type_).validate_python(json_decoder(raw))
+
+
+def set_base_url(url: str) -> None:
+    """Points all subsequent API requests at another node, e.g. a local stub server."""
+    global base_url
+    base_url = url
 
 
 def api_builder(
@@ -34,7 +127,7 @@ def api_builder(
     suffix: Api = "",
     start_index: int | None = None,
 ) -> str:
-    url = f"{BASE_URL}{endpoint.value}"
+    url = f"{base_url}{endpoint.value}"
 
     if resource_id != "":
         url += str(resource_id)
@@ -48,20 +141,46 @@ def api_builder(
     return url
 
 
+def endpoint_label(url: str) -> str:
+    """Returns the Api members the URL was built from, e.g. BLOCK_BY_HASH/TXS_SEGMENTS."""
+    path = url.removeprefix(base_url)
+    endpoints = sorted(Api, key=lambda api: len(api.value), reverse=True)
+    names = [next((api.name for api in endpoints if path.startswith(api.value)), "UNKNOWN")]
+    names.extend(api.name for api in endpoints if api.value.startswith("/") and api.value in path)
+    return "/".join(names)
+
+
 T = TypeVar("T")
 
 
-@retry_decorator
-def _fetch(url: str, timeout: int, extractor: Callable[[requests.Response], T]) -> T:
-    logger.debug(f"Requesting URL: {url}")
-    response = requests.get(url, timeout=timeout)
-    response.raise_for_status()
+def _get(url: str, timeout: int, extractor: Callable[["requests.Response"], T]) -> T:
+    import requests
+
+    logger.debug("Requesting URL: %s", url)
+    with metrics.timer(
+        "http_request_seconds", endpoint=endpoint_label(url) if metrics.enabled else ""
+    ):
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
     return extractor(response)
 
 
+@lru_cache
+def _retrying_get() -> Callable:
+    return retry_decorator()(_get)
+
+
+def _fetch(url: str, timeout: int, extractor: Callable[["requests.Response"], T]) -> T:
+    return _retrying_get()(url, timeout, extractor)
+
+
 def fetch_json(url: str, timeout: int = DEFAULT_TIMEOUT) -> dict:
-    return _fetch(url, timeout, lambda r: r.json())
+    return _fetch(url, timeout, lambda r: json_decoder(r.content))
 
 
 def fetch_text(url: str, timeout: int = DEFAULT_TIMEOUT) -> str:
     return _fetch(url, timeout, lambda r: r.text)
+
+
+def fetch_bytes(url: str, timeout: int = DEFAULT_TIMEOUT) -> bytes:
+    return _fetch(url, timeout, lambda r: r.content)